@@ -1,17 +1,25 @@
 # Slide2Thesis - AI-powered academic document generation
 # This file provides backward compatibility by importing from the new src structure
 
-from src.ai.ai_api_interface import AIAPIInterface
-from src.ai.gemini_api import GeminiAPI
-from src.ai.openai_api import OpenAIAPI
-from src.ai.api_factory import create_ai_api, get_available_providers, get_default_models
-from src.processors.text_extractor import TextExtractor
-from src.processors.page_classifier import PageClassifier
-from src.processors.chapter_generator import ChapterGenerator
-from src.processors.yaml_metadata_generator import YamlMetadataGenerator
-from src.processors.citation_generator import CitationGenerator
-from src.processors.thesis_compiler import ThesisCompiler
-from src.utils.style_manager import StyleManager
+import importlib
+
+# Submodules are imported on first attribute access (PEP 562) so that importing
+# the package does not pull in every provider SDK and processing dependency.
+_lazy = {
+    'AIAPIInterface': 'src.ai.ai_api_interface',
+    'GeminiAPI': 'src.ai.gemini_api',
+    'OpenAIAPI': 'src.ai.openai_api',
+    'create_ai_api': 'src.ai.api_factory',
+    'get_available_providers': 'src.ai.api_factory',
+    'get_default_models': 'src.ai.api_factory',
+    'TextExtractor': 'src.processors.text_extractor',
+    'PageClassifier': 'src.processors.page_classifier',
+    'ChapterGenerator': 'src.processors.chapter_generator',
+    'CitationGenerator': 'src.processors.citation_generator',
+    'YamlMetadataGenerator': 'src.processors.yaml_metadata_generator',
+    'ThesisCompiler': 'src.processors.thesis_compiler',
+    'StyleManager': 'src.utils.style_manager',
+}
 
 __all__ = [
     'AIAPIInterface',
@@ -27,4 +35,15 @@ __all__ = [
     'CitationGenerator',
     'ThesisCompiler',
     'StyleManager'
-] 
\ No newline at end of file
+]
+
+def __getattr__(name):
+    if name in _lazy:
+        module = importlib.import_module(_lazy[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
@@ -1,13 +1,15 @@
 import os
 import uuid
 import shutil
-import io
 from flask import Flask, request, render_template, send_file, redirect, url_for, flash, jsonify
 from werkzeug.utils import secure_filename
 import zipfile
+import tempfile
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import sys
+from collections import deque
 
 # Import the necessary classes from your main application
 from src.ai.api_factory import create_ai_api
@@ -18,25 +20,40 @@ from src.processors.yaml_metadata_generator import YamlMetadataGenerator
 from src.processors.thesis_compiler import ThesisCompiler
 from src.processors.citation_generator import CitationGenerator
 from src.processors.figure_generator import FigureGenerator
+from src.utils.job_store import JobStore
+from src.utils.log_setup import configure_logging
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
-# Ensure upload and results directories exist
+# Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs('results', exist_ok=True)
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Set up logging once for the web app; library modules only create loggers
+configure_logging(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Track job status
-jobs = {}
+class JobLogHandler(logging.Handler):
+    """Keeps the most recent formatted log lines of a job in a bounded deque."""
+    
+    def __init__(self, maxlen: int = 200):
+        super().__init__()
+        self.dq = deque(maxlen=maxlen)
+    
+    def emit(self, record):
+        try:
+            self.dq.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+# Bounded work queue for pipeline jobs; extra uploads wait instead of competing
+# for CPU, memory and provider rate limits
+EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv('WORKERS', 4)), thread_name_prefix='job-worker')
+
+# Track job status in SQLite so every worker process sees the same jobs
+jobs = JobStore(os.getenv('JOBS_DB', 'jobs.db'))
 
 @app.route('/')
 def index():
@@ -75,22 +92,9 @@ def upload_file():
         file_path = os.path.join(job_dir, filename)
         file.save(file_path)
         
-        # Initialize job status
-        jobs[job_id] = {
-            'status': 'processing',
-            'message': 'Job started',
-            'filename': filename,
-            'file_path': file_path,
-            'result_path': None
-        }
-        
-        # Start processing in a background thread
-        thread = threading.Thread(
-            target=process_pdf_background,
-            args=(job_id, file_path, api_key, email, google_api_key, google_engine_id)
-        )
-        thread.daemon = True
-        thread.start()
+        # Initialize job status and queue the job for processing
+        jobs.create(job_id, filename, file_path, status='queued', message='Job queued')
+        EXECUTOR.submit(process_pdf_background, job_id, file_path, api_key, email, google_api_key, google_engine_id)
         
         return redirect(url_for('job_status', job_id=job_id))
     
@@ -98,27 +102,30 @@ def upload_file():
     return redirect(request.url)
 
 def process_pdf_background(job_id, file_path, api_key, email, google_api_key, google_engine_id):
+    # Name the worker thread after the job so the job's log handler can filter on it
+    worker_thread = threading.current_thread()
+    worker_name = worker_thread.name
+    worker_thread.name = f"job-{job_id}"
+    jobs.update(job_id, status='processing', message='Job started')
     try:
         # Get the debug folder path
         pdf_basename = os.path.splitext(os.path.basename(file_path))[0]
         debug_folder = os.path.join(os.path.dirname(file_path), f"{pdf_basename}_debug")
         os.makedirs(debug_folder, exist_ok=True)
         
-        # Set up logging handler to capture log messages
-        log_capture_string = io.StringIO()
-        ch = logging.StreamHandler(log_capture_string)
+        # Capture this job's pipeline log messages on the package logger (not root)
+        job_thread_name = f"job-{job_id}"
+        ch = JobLogHandler()
         ch.setLevel(logging.INFO)
         ch.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-        logger = logging.getLogger()
-        logger.addHandler(ch)
+        ch.addFilter(lambda record: record.threadName == job_thread_name)
+        pipeline_logger = logging.getLogger('src')
+        pipeline_logger.addHandler(ch)
         
         # Update job status based on log messages
         def update_status_from_logs():
-            log_contents = log_capture_string.getvalue()
-            lines = log_contents.strip().split('\n')
-            if lines:
-                latest_line = lines[-1]
-                jobs[job_id]['message'] = latest_line
+            if ch.dq:
+                jobs.update(job_id, message=ch.dq[-1])
         
         # Create AI API instance using factory (default to Gemini for web interface)
         ai_api = create_ai_api(
@@ -130,7 +137,7 @@ def process_pdf_background(job_id, file_path, api_key, email, google_api_key, go
         # Call the main processing function with periodic status updates
         try:
             # Step 1: Extract text
-            jobs[job_id]['message'] = "Step 1: Extracting text from PDF..."
+            jobs.update(job_id, message="Step 1: Extracting text from PDF...")
             extractor = TextExtractor(file_path, ai_api)
             extracted_text_file = os.path.join(debug_folder, "extracted_text.txt")
             extracted_data = extractor.extract_text(extracted_text_file)
@@ -139,7 +146,7 @@ def process_pdf_background(job_id, file_path, api_key, email, google_api_key, go
             update_status_from_logs()
             
             # Step 2: Categorize pages
-            jobs[job_id]['message'] = "Step 2: Categorizing pages..."
+            jobs.update(job_id, message="Step 2: Categorizing pages...")
             classifier = PageClassifier(ai_api)
             categorized_content = classifier.classify_pages(extracted_text_file, debug_folder)
             if not categorized_content:
@@ -147,7 +154,7 @@ def process_pdf_background(job_id, file_path, api_key, email, google_api_key, go
             update_status_from_logs()
             
             # Step 3: Generate chapters
-            jobs[job_id]['message'] = "Step 3: Generating chapters..."
+            jobs.update(job_id, message="Step 3: Generating chapters...")
             generator = ChapterGenerator(ai_api)
             generated_chapters = generator.generate_all_chapters(debug_folder, threads=4)
             if not generated_chapters:
@@ -155,21 +162,21 @@ def process_pdf_background(job_id, file_path, api_key, email, google_api_key, go
             update_status_from_logs()
             
             # Step 4: Add citations
-            jobs[job_id]['message'] = "Step 4: Adding citations to chapters..."
-            citation_gen = CitationGenerator(ai_api, email, google_api_key, google_engine_id)
+            jobs.update(job_id, message="Step 4: Adding citations to chapters...")
+            citation_gen = CitationGenerator(ai_api, email, google_api_key, google_engine_id, os.getenv('NCBI_API_KEY'))
             if not citation_gen.process_chapters(debug_folder, threads=4):
                 raise RuntimeError("Citation generation failed")
             update_status_from_logs()
             
             # Step 5: Add figures
-            jobs[job_id]['message'] = "Step 5: Adding figure references to chapters..."
+            jobs.update(job_id, message="Step 5: Adding figure references to chapters...")
             figure_gen = FigureGenerator(ai_api, crop_top_pixels=0)  # Default: no cropping for web interface
             if not figure_gen.process_chapters(debug_folder, threads=4):
                 raise RuntimeError("Figure reference generation failed")
             update_status_from_logs()
             
             # Step 6: Generate YAML metadata
-            jobs[job_id]['message'] = "Step 6: Generating YAML metadata..."
+            jobs.update(job_id, message="Step 6: Generating YAML metadata...")
             metadata_gen = YamlMetadataGenerator(ai_api)
             metadata_file = os.path.join(debug_folder, "thesis_metadata.yaml")
             if not metadata_gen.generate_metadata(debug_folder, metadata_file):
@@ -177,7 +184,7 @@ def process_pdf_background(job_id, file_path, api_key, email, google_api_key, go
             update_status_from_logs()
             
             # Step 7: Compile thesis
-            jobs[job_id]['message'] = "Step 7: Compiling thesis..."
+            jobs.update(job_id, message="Step 7: Compiling thesis...")
             compiler = ThesisCompiler()
             output_pdf = os.path.join(debug_folder, "thesis.pdf")
             if not compiler.compile_thesis(debug_folder, metadata_file, output_pdf):
@@ -185,70 +192,82 @@ def process_pdf_background(job_id, file_path, api_key, email, google_api_key, go
             update_status_from_logs()
             
             # All steps completed
-            jobs[job_id]['message'] = "All steps completed successfully!"
+            jobs.update(job_id, message="All steps completed successfully!")
             
         except Exception as e:
             # Update the message with the error
             error_message = f"Error: {str(e)}"
-            jobs[job_id]['message'] = error_message
-            jobs[job_id]['status'] = "failed"
+            jobs.update(job_id, status="failed", message=error_message)
             logger.error(error_message)
-            logger.removeHandler(ch)
+            pipeline_logger.removeHandler(ch)
             return
         
         # Remove the log handler
-        logger.removeHandler(ch)
-        
-        # Create a zip file with all results
-        result_dir = os.path.join('results', job_id)
-        os.makedirs(result_dir, exist_ok=True)
-        
-        zip_path = os.path.join(result_dir, 'thesis_package.zip')
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for root, _, files in os.walk(debug_folder):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, debug_folder)
-                    zipf.write(file_path, arcname)
+        pipeline_logger.removeHandler(ch)
         
-        # Update job status
-        jobs[job_id]['status'] = 'completed'
-        jobs[job_id]['result_path'] = zip_path
-        jobs[job_id]['message'] = 'Processing completed successfully!'
+        # Update job status (the results zip is built on download)
+        jobs.update(job_id, status='completed', result_path=debug_folder,
+                    message='Processing completed successfully!')
         
     except Exception as e:
-        jobs[job_id]['status'] = 'failed'
-        jobs[job_id]['message'] = f'Error: {str(e)}'
+        jobs.update(job_id, status='failed', message=f'Error: {str(e)}')
         logger.error(f"Job {job_id} failed: {str(e)}")
+    finally:
+        worker_thread.name = worker_name
+
+# File types stored without recompression in the results zip
+STORED_EXTENSIONS = {'.pdf', '.jpg', '.jpeg', '.png'}
+
+def build_results_zip(result_dir):
+    """Zip a job's output folder into a spooled temporary file.
+    
+    Archives up to 8 MB stay in memory; larger ones spill to a temporary file,
+    so no per-job zip is kept on disk.
+    """
+    zip_buffer = tempfile.SpooledTemporaryFile(max_size=8 << 20)
+    with zipfile.ZipFile(zip_buffer, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
+        for root, _, files in os.walk(result_dir):
+            for file in files:
+                file_path = os.path.join(root, file)
+                arcname = os.path.relpath(file_path, result_dir)
+                # Text outputs compress well at level 1; PDFs and images are already compressed
+                ext = os.path.splitext(file)[1].lower()
+                compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                zipf.write(file_path, arcname, compress_type=compress_type)
+    zip_buffer.seek(0)
+    return zip_buffer
 
 @app.route('/job/<job_id>')
 def job_status(job_id):
-    if job_id not in jobs:
+    job = jobs.get(job_id)
+    if job is None:
         flash('Job not found')
         return redirect(url_for('index'))
     
-    job = jobs[job_id]
     return render_template('job_status.html', job=job, job_id=job_id)
 
 @app.route('/api/job/<job_id>')
 def api_job_status(job_id):
-    if job_id not in jobs:
+    job = jobs.get(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
     
-    return jsonify(jobs[job_id])
+    return jsonify(job)
 
 @app.route('/download/<job_id>')
 def download_results(job_id):
-    if job_id not in jobs or jobs[job_id]['status'] != 'completed':
+    job = jobs.get(job_id)
+    if job is None or job['status'] != 'completed':
         flash('Results not available')
         return redirect(url_for('index'))
     
-    result_path = jobs[job_id]['result_path']
-    if not os.path.exists(result_path):
-        flash('Result file not found')
+    result_path = job['result_path']
+    if not result_path or not os.path.isdir(result_path):
+        flash('Result folder not found')
         return redirect(url_for('index'))
     
-    return send_file(result_path, as_attachment=True, download_name='thesis_package.zip')
+    return send_file(build_results_zip(result_path), mimetype='application/zip',
+                     as_attachment=True, download_name='thesis_package.zip')
 
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
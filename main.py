@@ -3,15 +3,10 @@
 import os
 import argparse
 import logging
-from src.ai.api_factory import create_ai_api
-from src.processors.text_extractor import TextExtractor
-from src.processors.page_classifier import PageClassifier
-from src.processors.chapter_generator import ChapterGenerator
-from src.processors.yaml_metadata_generator import YamlMetadataGenerator
-from src.processors.thesis_compiler import ThesisCompiler
-from src.processors.citation_generator import CitationGenerator
-from src.processors.figure_generator import FigureGenerator
+from concurrent.futures import ThreadPoolExecutor
 from src.utils.style_manager import StyleManager
+from src.utils.log_setup import configure_logging
+from src.utils.pipeline_state import PipelineState
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
@@ -55,7 +50,11 @@ def process_pdf(pdf_file, provider=None, model=None, gemini_api_key=None, openai
         logger.warning("Google API credentials not found. Google search will be disabled.")
         logger.info("To enable Google search, set GOOGLE_API_KEY and GOOGLE_ENGINE_ID environment variables.")
     
+    # Optional NCBI API key raises the PubMed rate limit
+    ncbi_api_key = os.getenv('NCBI_API_KEY')
+    
     # Create AI API instance using factory
+    from src.ai.api_factory import create_ai_api
     ai_api = create_ai_api(
         provider=provider,
         model=model,
@@ -67,44 +66,104 @@ def process_pdf(pdf_file, provider=None, model=None, gemini_api_key=None, openai
 
     # Run all steps
     if run_all:
-        logger.info("Step 1: Extracting text from PDF...")
-        extractor = TextExtractor(pdf_file, ai_api)
-        extracted_data = extractor.extract_text(extracted_text_file)
-        if not extracted_data:
-            logger.error("Text extraction failed")
-            raise RuntimeError("Text extraction failed")
+        # Processors (and their PDF, image and PubMed dependencies) are imported
+        # only for the steps that run
+        from src.processors.text_extractor import TextExtractor
+        from src.processors.page_classifier import PageClassifier
+        from src.processors.chapter_generator import ChapterGenerator
+        from src.processors.citation_generator import CitationGenerator
+        from src.processors.figure_generator import FigureGenerator
+        from src.processors.yaml_metadata_generator import YamlMetadataGenerator
+        from src.processors.thesis_compiler import ThesisCompiler
 
-        logger.info("Step 2: Categorizing pages...")
-        classifier = PageClassifier(ai_api)
-        categorized_content = classifier.classify_pages(extracted_text_file, debug_folder)
-        if not categorized_content:
-            logger.error("Page categorization failed")
-            raise RuntimeError("Page categorization failed")
+        # Steps whose inputs, settings and outputs are unchanged since the last
+        # run in this debug folder are skipped
+        state = PipelineState(debug_folder)
+        ai_params = (ai_api.provider_name, ai_api.model_name)
 
-        logger.info("Step 3: Generating chapters...")
-        generator = ChapterGenerator(ai_api)
-        generated_chapters = generator.generate_all_chapters(debug_folder, threads=threads)
-        if not generated_chapters:
-            logger.error("Chapter generation failed")
-            raise RuntimeError("Chapter generation failed")
+        extract_outputs = ('extracted_text.txt', 'page_*.jpg')
+        if state.is_current('extract_text', [os.path.abspath(pdf_file)], extract_outputs, ai_params):
+            logger.info("Step 1 cached, skipping")
+        else:
+            logger.info("Step 1: Extracting text from PDF...")
+            extractor = TextExtractor(pdf_file, ai_api)
+            extracted_data = extractor.extract_text(extracted_text_file)
+            if not extracted_data:
+                logger.error("Text extraction failed")
+                raise RuntimeError("Text extraction failed")
+            state.record('extract_text', extract_outputs)
 
-        logger.info("Step 4: Adding citations to chapters...")
-        citation_gen = CitationGenerator(ai_api, email, google_api_key, google_engine_id)
-        if not citation_gen.process_chapters(debug_folder, threads=threads):
-            logger.error("Citation generation failed")
-            raise RuntimeError("Citation generation failed")
+        classify_outputs = ('*_section.txt',)
+        if state.is_current('categorize_pages', ['extracted_text.txt'], classify_outputs, ai_params):
+            logger.info("Step 2 cached, skipping")
+        else:
+            logger.info("Step 2: Categorizing pages...")
+            classifier = PageClassifier(ai_api)
+            categorized_content = classifier.classify_pages(extracted_text_file, debug_folder)
+            if not categorized_content:
+                logger.error("Page categorization failed")
+                raise RuntimeError("Page categorization failed")
+            state.record('categorize_pages', classify_outputs)
 
-        logger.info("Step 5: Adding figure references to chapters...")
-        figure_gen = FigureGenerator(ai_api, crop_top_pixels=crop_top_pixels)
-        if not figure_gen.process_chapters(debug_folder, threads=threads):
+        chapter_outputs = ('*_chapter.md',)
+        if state.is_current('generate_chapters', classify_outputs, chapter_outputs, ai_params):
+            logger.info("Step 3 cached, skipping")
+        else:
+            logger.info("Step 3: Generating chapters...")
+            generator = ChapterGenerator(ai_api)
+            generated_chapters = generator.generate_all_chapters(debug_folder, threads=threads)
+            if not generated_chapters:
+                logger.error("Chapter generation failed")
+                raise RuntimeError("Chapter generation failed")
+            state.record('generate_chapters', chapter_outputs)
+
+        citation_outputs = ('*_chapter_cited.md',)
+        if state.is_current('add_citations', chapter_outputs, citation_outputs, ai_params):
+            logger.info("Step 4 cached, skipping")
+        else:
+            logger.info("Step 4: Adding citations to chapters...")
+            citation_gen = CitationGenerator(ai_api, email, google_api_key, google_engine_id, ncbi_api_key)
+            if not citation_gen.process_chapters(debug_folder, threads=threads):
+                logger.error("Citation generation failed")
+                raise RuntimeError("Citation generation failed")
+            state.record('add_citations', citation_outputs)
+
+        # Steps 5 and 6 only read the cited chapters from Step 4, so they run side by side
+        figure_outputs = ('*_chapter_with_figures.md',)
+        figures_current = state.is_current(
+            'add_figures', citation_outputs + extract_outputs, figure_outputs,
+            ai_params + (str(crop_top_pixels),))
+        metadata_outputs = (os.path.basename(metadata_file),)
+        metadata_current = state.is_current(
+            'generate_yaml', citation_outputs + ('introduction_section.txt',), metadata_outputs,
+            ai_params + (style,))
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            if figures_current:
+                logger.info("Step 5 cached, skipping")
+                figures_future = None
+            else:
+                logger.info("Step 5: Adding figure references to chapters...")
+                figure_gen = FigureGenerator(ai_api, crop_top_pixels=crop_top_pixels)
+                figures_future = executor.submit(figure_gen.process_chapters, debug_folder, threads=threads)
+            if metadata_current:
+                logger.info("Step 6 cached, skipping")
+                metadata_future = None
+            else:
+                logger.info("Step 6: Generating YAML metadata...")
+                metadata_gen = YamlMetadataGenerator(ai_api, style=style)
+                metadata_future = executor.submit(metadata_gen.generate_metadata, debug_folder, metadata_file)
+            figures_ok = figures_future.result() if figures_future else True
+            metadata_ok = metadata_future.result() if metadata_future else True
+        if not figures_ok:
             logger.error("Figure reference generation failed")
             raise RuntimeError("Figure reference generation failed")
-
-        logger.info("Step 6: Generating YAML metadata...")
-        metadata_gen = YamlMetadataGenerator(ai_api, style=style)
-        if not metadata_gen.generate_metadata(debug_folder, metadata_file):
+        if figures_future:
+            state.record('add_figures', figure_outputs)
+        if not metadata_ok:
             logger.error("YAML metadata generation failed")
             raise RuntimeError("YAML metadata generation failed")
+        if metadata_future:
+            state.record('generate_yaml', metadata_outputs)
 
         logger.info("Step 7: Compiling thesis...")
         compiler = ThesisCompiler(style=style)
@@ -117,6 +176,7 @@ def process_pdf(pdf_file, provider=None, model=None, gemini_api_key=None, openai
         # Run individual steps based on flags
         if extract_text:
             logger.info("Step 1: Extracting text from PDF...")
+            from src.processors.text_extractor import TextExtractor
             extractor = TextExtractor(pdf_file, ai_api)
             extracted_data = extractor.extract_text(extracted_text_file)
             if not extracted_data:
@@ -126,6 +186,7 @@ def process_pdf(pdf_file, provider=None, model=None, gemini_api_key=None, openai
             
         if categorize_pages:
             logger.info("Step 2: Categorizing pages...")
+            from src.processors.page_classifier import PageClassifier
             classifier = PageClassifier(ai_api)
             categorized_content = classifier.classify_pages(extracted_text_file, debug_folder)
             if not categorized_content:
@@ -135,6 +196,7 @@ def process_pdf(pdf_file, provider=None, model=None, gemini_api_key=None, openai
             
         if generate_chapters:
             logger.info("Step 3: Generating chapters...")
+            from src.processors.chapter_generator import ChapterGenerator
             generator = ChapterGenerator(ai_api)
             generated_chapters = generator.generate_all_chapters(debug_folder, threads=threads)
             if not generated_chapters:
@@ -144,7 +206,8 @@ def process_pdf(pdf_file, provider=None, model=None, gemini_api_key=None, openai
             
         if add_citations:
             logger.info("Step 4: Adding citations to chapters...")
-            citation_gen = CitationGenerator(ai_api, email, google_api_key, google_engine_id)
+            from src.processors.citation_generator import CitationGenerator
+            citation_gen = CitationGenerator(ai_api, email, google_api_key, google_engine_id, ncbi_api_key)
             if not citation_gen.process_chapters(debug_folder, threads=threads):
                 logger.error("Citation generation failed")
                 raise RuntimeError("Citation generation failed")
@@ -152,6 +215,7 @@ def process_pdf(pdf_file, provider=None, model=None, gemini_api_key=None, openai
             
         if add_figures:
             logger.info("Step 5: Adding figure references to chapters...")
+            from src.processors.figure_generator import FigureGenerator
             figure_gen = FigureGenerator(ai_api, crop_top_pixels=crop_top_pixels)
             if not figure_gen.process_chapters(debug_folder, threads=threads):
                 logger.error("Figure reference generation failed")
@@ -160,6 +224,7 @@ def process_pdf(pdf_file, provider=None, model=None, gemini_api_key=None, openai
             
         if generate_yaml:
             logger.info("Step 6: Generating YAML metadata...")
+            from src.processors.yaml_metadata_generator import YamlMetadataGenerator
             metadata_gen = YamlMetadataGenerator(ai_api, style=style)
             if not metadata_gen.generate_metadata(debug_folder, metadata_file):
                 logger.error("YAML metadata generation failed")
@@ -168,6 +233,7 @@ def process_pdf(pdf_file, provider=None, model=None, gemini_api_key=None, openai
             
         if compile_thesis:
             logger.info("Step 7: Compiling thesis...")
+            from src.processors.thesis_compiler import ThesisCompiler
             compiler = ThesisCompiler(style=style)
             if not compiler.compile_thesis(debug_folder, metadata_file, output_pdf):
                 logger.error("Thesis compilation failed")
@@ -229,11 +295,7 @@ def main():
 
     # Set up logging level based on verbose flag
     log_level = logging.DEBUG if args.verbose else logging.INFO
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        force=True  # Override any existing configuration
-    )
+    configure_logging(level=log_level)  # Replaces any existing configuration
     
     if args.verbose:
         logger.info("Debug logging enabled")
@@ -1,22 +1,28 @@
 # Slide2Thesis - AI-powered academic document generation
 
-from .ai.ai_api_interface import AIAPIInterface
-from .ai.gemini_api import GeminiAPI
-from .ai.openai_api import OpenAIAPI
-from .ai.api_factory import create_ai_api, get_available_providers, get_default_models
-
-from .processors.text_extractor import TextExtractor
-from .processors.page_classifier import PageClassifier
-from .processors.chapter_generator import ChapterGenerator
-from .processors.citation_generator import CitationGenerator
-from .processors.figure_generator import FigureGenerator
-from .processors.yaml_metadata_generator import YamlMetadataGenerator
-from .processors.thesis_compiler import ThesisCompiler
-
-from .utils.style_manager import StyleManager
+import importlib
 
 __version__ = "1.0.0"
 
+# Submodules are imported on first attribute access (PEP 562) so that importing
+# the package does not pull in every provider SDK and processing dependency.
+_lazy = {
+    'AIAPIInterface': '.ai.ai_api_interface',
+    'GeminiAPI': '.ai.gemini_api',
+    'OpenAIAPI': '.ai.openai_api',
+    'create_ai_api': '.ai.api_factory',
+    'get_available_providers': '.ai.api_factory',
+    'get_default_models': '.ai.api_factory',
+    'TextExtractor': '.processors.text_extractor',
+    'PageClassifier': '.processors.page_classifier',
+    'ChapterGenerator': '.processors.chapter_generator',
+    'CitationGenerator': '.processors.citation_generator',
+    'FigureGenerator': '.processors.figure_generator',
+    'YamlMetadataGenerator': '.processors.yaml_metadata_generator',
+    'ThesisCompiler': '.processors.thesis_compiler',
+    'StyleManager': '.utils.style_manager',
+}
+
 __all__ = [
     # AI API classes
     'AIAPIInterface',
@@ -37,4 +43,15 @@ __all__ = [
     
     # Utility classes
     'StyleManager',
-] 
\ No newline at end of file
+]
+
+def __getattr__(name):
+    if name in _lazy:
+        module = importlib.import_module(_lazy[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
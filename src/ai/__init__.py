@@ -1,9 +1,20 @@
 """AI API interface and implementations for Slide2Thesis."""
 
-from .ai_api_interface import AIAPIInterface
-from .gemini_api import GeminiAPI
-from .openai_api import OpenAIAPI
-from .api_factory import create_ai_api, get_available_providers, get_default_models
+import importlib
+
+# Submodules are imported on first attribute access (PEP 562) so that importing
+# the package does not pull in every provider SDK and processing dependency.
+_lazy = {
+    'AIAPIInterface': '.ai_api_interface',
+    'GeminiAPI': '.gemini_api',
+    'OpenAIAPI': '.openai_api',
+    'create_ai_api': '.api_factory',
+    'get_available_providers': '.api_factory',
+    'get_default_models': '.api_factory',
+    'AIAPIError': '.errors',
+    'RateLimitError': '.errors',
+    'APIConnectionError': '.errors',
+}
 
 __all__ = [
     'AIAPIInterface',
@@ -12,4 +23,18 @@ __all__ = [
     'create_ai_api',
     'get_available_providers',
     'get_default_models',
-] 
\ No newline at end of file
+    'AIAPIError',
+    'RateLimitError',
+    'APIConnectionError',
+]
+
+def __getattr__(name):
+    if name in _lazy:
+        module = importlib.import_module(_lazy[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
@@ -0,0 +1,140 @@
+import os
+import time
+import re
+import hashlib
+import threading
+import logging
+from typing import Any, Callable, Optional
+from PIL import Image
+from .ai_api_interface import AIAPIInterface
+from ._perf import record_call
+from .errors import APIConnectionError, RateLimitError
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def _cache_enabled() -> bool:
+    return os.getenv('CHAPTER_CACHE') == '1'
+
+def _cache_path(ai_api: AIAPIInterface, prompt: str, image: Optional[Image.Image],
+                cache_dir: str, cache_key: Optional[str]) -> str:
+    # Whitespace is collapsed so prompts differing only in layout/indentation share an entry
+    key_text = _WHITESPACE_RE.sub(' ', prompt if cache_key is None else cache_key).strip()
+    digest = hashlib.sha256((ai_api.model_name + key_text).encode('utf-8'))
+    if image is not None:
+        # Key on the decoded pixels so the same slide hits regardless of how it was loaded
+        digest.update(f"\0{image.mode}\0{image.size}\0".encode('utf-8'))
+        digest.update(image.tobytes())
+    return os.path.join(cache_dir, digest.hexdigest())
+
+def _read_cached(path: str) -> Optional[str]:
+    if os.getenv('AI_CACHE_FORCE_REFRESH') != '1' and os.path.exists(path):
+        logger.debug(f"AI cache hit: {os.path.basename(path)}")
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return None
+
+def _store(path: str, cache_dir: str, output: Optional[str],
+           cache_if: Optional[Callable[[str], bool]]) -> None:
+    if output and (cache_if is None or cache_if(output)):
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see partial output
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+        os.replace(tmp_path, path)
+
+def generate_or_none(ai_api: AIAPIInterface, prompt: str, image: Optional[Image.Image] = None,
+                     response_schema: Optional[Any] = None) -> Optional[str]:
+    """Generate content, returning None once the provider's retries are exhausted.
+    
+    Providers retry rate-limit and connection errors themselves and re-raise them
+    when their attempts run out; callers treat that like any other failed call.
+    
+    Args:
+        ai_api: Instance of AIAPIInterface for content generation.
+        prompt: The text prompt for content generation.
+        image: Optional PIL Image object to include in the generation.
+        response_schema: Optional type describing the expected JSON output.
+        
+    Returns:
+        Generated text content or None if generation fails.
+    """
+    try:
+        return ai_api.generate_content(prompt, image, response_schema)
+    except (RateLimitError, APIConnectionError) as e:
+        logger.error(f"Giving up after retries: {e}")
+        return None
+
+async def _generate_or_none_async(ai_api: AIAPIInterface, prompt: str, image: Optional[Image.Image],
+                                  response_schema: Optional[Any]) -> Optional[str]:
+    """Async counterpart of generate_or_none."""
+    try:
+        return await ai_api.generate_content_async(prompt, image, response_schema)
+    except (RateLimitError, APIConnectionError) as e:
+        logger.error(f"Giving up after retries: {e}")
+        return None
+
+def cached_generate(ai_api: AIAPIInterface, prompt: str, image: Optional[Image.Image] = None,
+                    cache_dir: str = ".ai_cache", cache_key: Optional[str] = None,
+                    cache_if: Optional[Callable[[str], bool]] = None,
+                    response_schema: Optional[Any] = None) -> Optional[str]:
+    """Generate content, reusing a content-addressed disk cache when enabled.
+    
+    The cache is only consulted when the CHAPTER_CACHE environment variable is set
+    to "1"; otherwise this is a plain call to generate_or_none. Calls with an
+    image are keyed on the image's pixel data as well as the prompt. Setting
+    AI_CACHE_FORCE_REFRESH=1 skips cache reads but still stores fresh responses.
+    
+    Args:
+        ai_api: Instance of AIAPIInterface used on cache misses.
+        prompt: The text prompt for content generation.
+        image: Optional PIL Image object to include in the generation.
+        cache_dir: Directory holding cached responses (default: '.ai_cache').
+        cache_key: Text the cache key is derived from instead of the prompt. Runs of
+            whitespace in the key text are collapsed, so prompts that differ only in
+            spacing or line breaks share an entry.
+        cache_if: Optional predicate; responses for which it returns False (e.g.
+            unparseable output) are returned but not cached.
+        response_schema: Optional type describing the expected JSON output, passed
+            through to ai_api.generate_content.
+        
+    Returns:
+        Generated text content or None if generation fails.
+    """
+    if not _cache_enabled():
+        return generate_or_none(ai_api, prompt, image, response_schema)
+    
+    started = time.perf_counter()
+    path = _cache_path(ai_api, prompt, image, cache_dir, cache_key)
+    cached = _read_cached(path)
+    if cached is not None:
+        record_call(ai_api.model_name, prompt, cached, started, cache_hit=True)
+        return cached
+    
+    output = generate_or_none(ai_api, prompt, image, response_schema)
+    _store(path, cache_dir, output, cache_if)
+    return output
+
+async def cached_generate_async(ai_api: AIAPIInterface, prompt: str, image: Optional[Image.Image] = None,
+                                cache_dir: str = ".ai_cache", cache_key: Optional[str] = None,
+                                cache_if: Optional[Callable[[str], bool]] = None,
+                                response_schema: Optional[Any] = None) -> Optional[str]:
+    """Async counterpart of cached_generate using ai_api.generate_content_async.
+    
+    Takes the same arguments and shares the same cache entries as cached_generate.
+    """
+    if not _cache_enabled():
+        return await _generate_or_none_async(ai_api, prompt, image, response_schema)
+    
+    started = time.perf_counter()
+    path = _cache_path(ai_api, prompt, image, cache_dir, cache_key)
+    cached = _read_cached(path)
+    if cached is not None:
+        record_call(ai_api.model_name, prompt, cached, started, cache_hit=True)
+        return cached
+    
+    output = await _generate_or_none_async(ai_api, prompt, image, response_schema)
+    _store(path, cache_dir, output, cache_if)
+    return output
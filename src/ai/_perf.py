@@ -0,0 +1,83 @@
+import os
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency buckets in the exit summary
+_LATENCY_BUCKETS_MS = (1000, 5000, 30000)
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_initialized = False
+_started_at = time.time()
+
+def _connection() -> Optional[sqlite3.Connection]:
+    """Open the call log named by AI_PERF_DB on first use; None when it is unset."""
+    global _conn, _initialized
+    if not _initialized:
+        _initialized = True
+        path = os.getenv('AI_PERF_DB')
+        if path:
+            _conn = sqlite3.connect(os.path.expanduser(path), check_same_thread=False, timeout=30)
+            with _conn:
+                _conn.execute("PRAGMA journal_mode=WAL")
+                _conn.execute(
+                    "CREATE TABLE IF NOT EXISTS calls ("
+                    "ts REAL, model TEXT, prompt_len INTEGER, resp_len INTEGER, "
+                    "wall_ms REAL, cache_hit INTEGER, err TEXT)"
+                )
+            atexit.register(_log_summary)
+    return _conn
+
+def record_call(model: str, prompt: str, response: Optional[str], started: float,
+                cache_hit: bool = False, error: Optional[str] = None) -> None:
+    """Append one model call to the AI_PERF_DB SQLite log, if enabled.
+
+    Args:
+        model: Model name the call was made with.
+        prompt: Prompt text (only its length is stored).
+        response: Response text, or None if the call produced none.
+        started: time.perf_counter() value taken when the call began.
+        cache_hit: Whether the response came from the disk cache.
+        error: Exception class name if the call raised.
+    """
+    wall_ms = (time.perf_counter() - started) * 1000
+    with _lock:
+        conn = _connection()
+        if conn is None:
+            return
+        with conn:
+            conn.execute(
+                "INSERT INTO calls (ts, model, prompt_len, resp_len, wall_ms, cache_hit, err) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), model, len(prompt), len(response) if response else 0,
+                 wall_ms, int(cache_hit), error)
+            )
+
+def _log_summary() -> None:
+    """Log a one-line summary of the calls recorded by this process."""
+    with _lock:
+        if _conn is None:
+            return
+        rows = _conn.execute(
+            "SELECT wall_ms, cache_hit, err FROM calls WHERE ts >= ?", (_started_at,)
+        ).fetchall()
+        _conn.close()
+    if not rows:
+        return
+    api_ms = [wall_ms for wall_ms, cache_hit, _ in rows if not cache_hit]
+    buckets = [0] * (len(_LATENCY_BUCKETS_MS) + 1)
+    for wall_ms in api_ms:
+        buckets[sum(wall_ms >= bound for bound in _LATENCY_BUCKETS_MS)] += 1
+    labels = ['<1s', '1-5s', '5-30s', '>=30s']
+    histogram = ' '.join(f"{label}:{count}" for label, count in zip(labels, buckets))
+    logger.info(
+        f"AI calls: {len(rows)} ({len(rows) - len(api_ms)} cached, "
+        f"{sum(1 for row in rows if row[2])} failed), "
+        f"API wall time {sum(api_ms) / 1000:.1f}s [{histogram}]"
+    )
@@ -1,23 +1,60 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Any, List, Optional
 from PIL import Image
 
 class AIAPIInterface(ABC):
     """Abstract base class for AI API providers."""
     
     @abstractmethod
-    def generate_content(self, prompt: str, image: Optional[Image.Image] = None) -> Optional[str]:
+    def generate_content(self, prompt: str, image: Optional[Image.Image] = None,
+                         response_schema: Optional[Any] = None) -> Optional[str]:
         """Generate content using the AI API.
         
         Args:
             prompt: The text prompt for content generation.
             image: Optional PIL Image object to include in the generation.
+            response_schema: Optional type (e.g. a TypedDict) describing the expected
+                JSON output. Providers that support structured output constrain the
+                response to valid JSON; others may ignore it.
             
         Returns:
             Generated text content or None if generation fails.
         """
         pass
     
+    async def generate_content_async(self, prompt: str, image: Optional[Image.Image] = None,
+                                     response_schema: Optional[Any] = None) -> Optional[str]:
+        """Asynchronously generate content using the AI API.
+        
+        The default implementation runs the blocking generate_content call in a
+        worker thread so many requests can be in flight from one event loop.
+        
+        Args:
+            prompt: The text prompt for content generation.
+            image: Optional PIL Image object to include in the generation.
+            response_schema: Optional type describing the expected JSON output.
+            
+        Returns:
+            Generated text content or None if generation fails.
+        """
+        return await asyncio.to_thread(self.generate_content, prompt, image, response_schema)
+    
+    def submit_batch(self, prompts: List[str], response_schema: Optional[Any] = None) -> List[Optional[str]]:
+        """Generate content for several independent text prompts.
+        
+        Providers with a server-side batch API override this; the default
+        implementation simply calls generate_content for each prompt in turn.
+        
+        Args:
+            prompts: Text prompts to generate content for.
+            response_schema: Optional type describing the expected JSON output.
+            
+        Returns:
+            Generated text for each prompt, in order (None where generation failed).
+        """
+        return [self.generate_content(prompt, response_schema=response_schema) for prompt in prompts]
+    
     @property
     @abstractmethod
     def model_name(self) -> str:
@@ -1,12 +1,29 @@
 import os
+import hashlib
 import logging
-from typing import Optional
+import threading
+from typing import Final, Optional
 from .ai_api_interface import AIAPIInterface
-from .gemini_api import GeminiAPI
-from .openai_api import OpenAIAPI
 
 logger = logging.getLogger(__name__)
 
+# API instances keyed by (provider, model, sha256(api_key)) so repeated calls
+# reuse the same client and its HTTP connection pool
+_api_cache: dict[tuple[str, str, str], AIAPIInterface] = {}
+_API_CACHE_MAXSIZE = 32
+
+# Model name prefixes for each provider, checked in order
+_PROVIDER_PREFIXES: Final = (
+    ('gemini', ('gemini',)),
+    ('openai', ('gpt', 'o1', 'o3', 'o4')),
+)
+
+_DEFAULT_MODELS: Final = {
+    'gemini': 'gemini-2.5-pro',
+    'openai': 'o4-mini'
+}
+_api_cache_lock = threading.Lock()
+
 def detect_provider_from_model(model: str) -> str:
     """Detect the API provider based on model name patterns.
     
@@ -18,14 +35,13 @@ def detect_provider_from_model(model: str) -> str:
     """
     model_lower = model.lower()
     
-    if model_lower.startswith('gemini'):
-        return 'gemini'
-    elif model_lower.startswith(('gpt', 'o1')):
-        return 'openai'
-    else:
-        # Default to gemini for unknown patterns
-        logger.warning(f"Unknown model pattern '{model}', defaulting to Gemini")
-        return 'gemini'
+    for provider, prefixes in _PROVIDER_PREFIXES:
+        if model_lower.startswith(prefixes):
+            return provider
+    
+    # Default to gemini for unknown patterns
+    logger.warning(f"Unknown model pattern '{model}', defaulting to Gemini")
+    return 'gemini'
 
 def create_ai_api(
     provider: Optional[str] = None,
@@ -35,6 +51,9 @@ def create_ai_api(
 ) -> AIAPIInterface:
     """Create an AI API instance based on provider and model.
     
+    Instances are cached per provider, model and API key, so repeated calls
+    (e.g. one per web job) share a single client and its connection pool.
+    
     Args:
         provider: API provider ('gemini', 'openai', or 'auto'). If None, auto-detect from model.
         model: Model name. If None, use default for the provider.
@@ -61,24 +80,42 @@ def create_ai_api(
     
     # Set default models if not specified
     if model is None:
-        default_models = get_default_models()
-        model = default_models.get(provider)
+        model = _DEFAULT_MODELS.get(provider)
         if model is None:
             raise ValueError(f"Unknown provider: {provider}")
     
-    # Create the appropriate API instance
+    # Create the appropriate API instance (provider SDKs are imported on demand)
     if provider == 'gemini':
         if not gemini_api_key:
             raise ValueError("Gemini API key is required for Gemini provider")
-        return GeminiAPI(api_key=gemini_api_key, model=model)
-    
+        api_key = gemini_api_key
     elif provider == 'openai':
         if not openai_api_key:
             raise ValueError("OpenAI API key is required for OpenAI provider")
-        return OpenAIAPI(api_key=openai_api_key, model=model)
-    
+        api_key = openai_api_key
     else:
         raise ValueError(f"Unsupported provider: {provider}")
+    
+    cache_key = (provider, model, hashlib.sha256(api_key.encode('utf-8')).hexdigest())
+    with _api_cache_lock:
+        ai_api = _api_cache.get(cache_key)
+        if ai_api is None:
+            if provider == 'gemini':
+                from .gemini_api import GeminiAPI
+                # GEMINI_RPM sizes the shared token bucket to the project's quota
+                rpm = os.getenv('GEMINI_RPM')
+                if rpm:
+                    ai_api = GeminiAPI(api_key=api_key, model=model, rps=float(rpm) / 60)
+                else:
+                    ai_api = GeminiAPI(api_key=api_key, model=model)
+            else:
+                from .openai_api import OpenAIAPI
+                ai_api = OpenAIAPI(api_key=api_key, model=model)
+            if len(_api_cache) >= _API_CACHE_MAXSIZE:
+                # Evict the oldest instance (dicts keep insertion order)
+                _api_cache.pop(next(iter(_api_cache)))
+            _api_cache[cache_key] = ai_api
+    return ai_api
 
 def get_available_providers() -> list[str]:
     """Get list of available API providers.
@@ -94,7 +131,4 @@ def get_default_models() -> dict[str, str]:
     Returns:
         Dictionary mapping provider names to default model names.
     """
-    return {
-        'gemini': 'gemini-2.5-pro',
-        'openai': 'o4-mini'
-    } 
\ No newline at end of file
+    return dict(_DEFAULT_MODELS) 
\ No newline at end of file
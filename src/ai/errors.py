@@ -0,0 +1,17 @@
+"""Exceptions raised by AI API implementations."""
+
+from typing import Optional
+
+class AIAPIError(Exception):
+    """Base class for errors raised by AI API providers."""
+
+class RateLimitError(AIAPIError):
+    """The provider rejected the request because a rate limit or quota was hit."""
+    
+    def __init__(self, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(message)
+        # Seconds the provider asked callers to wait before retrying, if it said
+        self.retry_after = retry_after
+
+class APIConnectionError(AIAPIError):
+    """The request failed due to a network error, timeout or transient server error."""
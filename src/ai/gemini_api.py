@@ -1,35 +1,146 @@
+import io
+import hashlib
+import re
 import time
+import asyncio
 import logging
-from tenacity import retry, stop_after_attempt, wait_exponential
+import threading
+from tenacity import retry, retry_if_exception_type, wait_exponential
+import httpx
 from google import genai
 from google.genai import types
 from PIL import Image
-from typing import Optional, Union
+from typing import Any, List, Optional, Union
 from .ai_api_interface import AIAPIInterface
+from .errors import APIConnectionError, RateLimitError
+from ._perf import record_call
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# JPEG quality for image parts; high enough to keep slide text legible
+_JPEG_QUALITY = 85
+
+# genai clients keyed by sha256(api_key), shared by every GeminiAPI instance
+_clients: dict[str, genai.Client] = {}
+_clients_lock = threading.Lock()
+
+# Terminal states of a Gemini batch job
+_BATCH_DONE_STATES = frozenset({
+    'JOB_STATE_SUCCEEDED', 'JOB_STATE_FAILED', 'JOB_STATE_CANCELLED', 'JOB_STATE_EXPIRED',
+})
+
+class _TokenBucket:
+    """Thread-safe token bucket refilled at ``rate`` tokens per second."""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _try_take(self) -> float:
+        """Consume a token if one is available; otherwise return the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+    
+    def acquire(self) -> None:
+        """Block until a token is available, then consume it."""
+        while (wait := self._try_take()) > 0:
+            time.sleep(wait)
+    
+    async def acquire_async(self) -> None:
+        """Wait without blocking the event loop until a token is available, then consume it."""
+        while (wait := self._try_take()) > 0:
+            await asyncio.sleep(wait)
+
+# Quota errors need minutes to clear, so they get a long backoff and more attempts;
+# transient network errors are retried quickly and give up sooner.
+_RATE_LIMIT_ATTEMPTS = 6
+_NETWORK_ATTEMPTS = 3
+_rate_limit_wait = wait_exponential(multiplier=1, min=30, max=300)
+_network_wait = wait_exponential(multiplier=1, min=1, max=5)
+# RetryInfo detail in RESOURCE_EXHAUSTED errors, e.g. 'retryDelay': '37s'
+_RETRY_DELAY_RE = re.compile(r"""retryDelay['"]?\s*:\s*['"]?(\d+(?:\.\d+)?)s""")
+
+def _wait_for_error(retry_state) -> float:
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, RateLimitError):
+        if exc.retry_after is not None:
+            return min(exc.retry_after, 300.0)
+        return _rate_limit_wait(retry_state)
+    return _network_wait(retry_state)
+
+def _stop_for_error(retry_state) -> bool:
+    exc = retry_state.outcome.exception()
+    limit = _RATE_LIMIT_ATTEMPTS if isinstance(exc, RateLimitError) else _NETWORK_ATTEMPTS
+    return retry_state.attempt_number >= limit
+
+# Retry policy shared by the blocking and async generate calls
+_retry_api_call = retry(
+    stop=_stop_for_error,
+    wait=_wait_for_error,
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError)),
+    before_sleep=lambda retry_state: logger.warning(
+        f"Retrying API call in {retry_state.next_action.sleep:.0f}s, attempt {retry_state.attempt_number}"),
+    reraise=True
+)
+
+def _raise_if_retryable(e: Exception) -> None:
+    """Re-raise rate-limit and transient network errors as retryable AI API errors."""
+    code = getattr(e, 'code', None)
+    if code == 429 or "RESOURCE_EXHAUSTED" in str(e):
+        logger.warning("Rate limit hit, will retry if attempts remain")
+        delay = _RETRY_DELAY_RE.search(str(e))
+        raise RateLimitError(str(e), retry_after=float(delay.group(1)) if delay else None) from e
+    if code in (500, 502, 503, 504) or "Server disconnected" in str(e) or "timeout" in str(e).lower():
+        logger.warning("Network error detected, will retry if attempts remain")
+        raise APIConnectionError(str(e)) from e
+
+def _shared_client(api_key: str) -> genai.Client:
+    """Return the process-wide ``genai.Client`` for an API key, creating it once.
+    
+    Instances for different models share the client, and with it the HTTP
+    connection pool, so warm TLS connections are reused across them.
+    """
+    key = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # Configure HTTP options with timeout in milliseconds. The SDK keeps one
+            # httpx client per genai.Client; size its pool so concurrent chapter
+            # workers reuse warm keep-alive connections instead of re-handshaking.
+            http_options = types.HttpOptions(
+                timeout=2 * 60 * 1000,  # 2 minutes in milliseconds (180,000 ms)
+                client_args={'limits': httpx.Limits(max_keepalive_connections=16, max_connections=32)},
+                # Async connections belong to the event loop that opened them, and callers
+                # run a fresh loop per stage (asyncio.run), so keep none idle between calls
+                async_client_args={'limits': httpx.Limits(max_keepalive_connections=0, max_connections=32)},
+            )
+            client = genai.Client(api_key=api_key, http_options=http_options)
+            _clients[key] = client
+    return client
+
 class GeminiAPI(AIAPIInterface):
     """Handles all interactions with the Gemini API, including retries and rate limiting."""
     
-    def __init__(self, api_key: str, model: str = "gemini-2.5-pro-preview-06-05"):
+    def __init__(self, api_key: str, model: str = "gemini-2.5-pro-preview-06-05", rps: float = 2.0):
         """Initialize the Gemini API client.
         
         Args:
             api_key: The API key for authentication.
             model: The Gemini model name to use (default: 'gemini-2.5-pro-preview-06-05').
+            rps: Maximum request rate shared by all threads using this client (default: 2.0).
         """
-        # Configure HTTP options with timeout in milliseconds
-        http_options = types.HttpOptions(
-            timeout=2 * 60 * 1000  # 2 minutes in milliseconds (180,000 ms)
-        )
-        self.client = genai.Client(api_key=api_key, http_options=http_options)
+        self.client = _shared_client(api_key)
         self.model = model
+        self._limiter = _TokenBucket(rps)
     
     @property
     def model_name(self) -> str:
@@ -41,37 +152,157 @@ class GeminiAPI(AIAPIInterface):
         """Return the provider name."""
         return "gemini"
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry_error_callback=lambda retry_state: logger.warning(f"Retrying API call, attempt {retry_state.attempt_number}")
-    )
-    def generate_content(self, prompt: str, image: Optional[Image.Image] = None) -> Optional[str]:
+    @staticmethod
+    def _json_config(response_schema: Optional[Any]) -> Optional[types.GenerateContentConfig]:
+        """Build a structured-output config for a response schema, if any."""
+        if response_schema is None:
+            return None
+        return types.GenerateContentConfig(response_mime_type="application/json",
+                                           response_schema=response_schema)
+    
+    @staticmethod
+    def _build_contents(prompt: str, image: Optional[Image.Image]) -> List[Any]:
+        """Assemble request contents, encoding the image to a JPEG part.
+        
+        The SDK would otherwise re-encode a PIL image as PNG on every retry;
+        encoding once here keeps the bytes fixed across attempts and uploads
+        a much smaller payload.
+        """
+        contents: List[Any] = [prompt]
+        if image:
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            buffer = io.BytesIO()
+            image.save(buffer, format='JPEG', quality=_JPEG_QUALITY)
+            contents.append(types.Part.from_bytes(data=buffer.getvalue(), mime_type='image/jpeg'))
+        return contents
+    
+    def generate_content(self, prompt: str, image: Optional[Image.Image] = None,
+                         response_schema: Optional[Any] = None) -> Optional[str]:
         """Generate content using the Gemini API with retry logic.
         
         Args:
             prompt: The text prompt for content generation.
             image: Optional PIL Image object to include in the generation.
+            response_schema: Optional type describing the expected JSON output; the
+                model is then constrained to emit JSON matching it.
             
         Returns:
             Generated text content or None if generation fails.
+            
+        Raises:
+            RateLimitError: If the rate limit is still hit after retries.
+            APIConnectionError: If network or server errors persist after retries.
         """
+        return self._generate(self._build_contents(prompt, image), response_schema)
+    
+    @_retry_api_call
+    def _generate(self, contents: List[Any], response_schema: Optional[Any]) -> Optional[str]:
+        """Send prepared contents to the model; retried by ``_retry_api_call``."""
+        self._limiter.acquire()
+        started = time.perf_counter()
+        text, error = None, None
         try:
-            contents = [prompt]
-            if image:
-                contents.append(image)
-            
             response = self.client.models.generate_content(
                 model=self.model,
-                contents=contents
+                contents=contents,
+                config=self._json_config(response_schema)
             )
-            time.sleep(1)  # Avoid rate limiting
-            return response.text if response.text else None
+            text = response.text if response.text else None
+            return text
         except Exception as e:
+            error = type(e).__name__
             logger.error(f"Gemini API call failed: {e}")
-            # For network-related errors, allow retry
-            if "Server disconnected" in str(e) or "timeout" in str(e).lower():
-                logger.warning("Network error detected, will retry if attempts remain")
-                raise
+            # Rate limits and network-related errors are retried
+            _raise_if_retryable(e)
             # For other errors, don't retry
-            return None 
\ No newline at end of file
+            return None
+        finally:
+            record_call(self.model, contents[0], text, started, error=error)
+    
+    async def generate_content_async(self, prompt: str, image: Optional[Image.Image] = None,
+                                     response_schema: Optional[Any] = None) -> Optional[str]:
+        """Generate content with the SDK's native async client and the same retry logic.
+        
+        Args:
+            prompt: The text prompt for content generation.
+            image: Optional PIL Image object to include in the generation.
+            response_schema: Optional type describing the expected JSON output.
+            
+        Returns:
+            Generated text content or None if generation fails.
+            
+        Raises:
+            RateLimitError: If the rate limit is still hit after retries.
+            APIConnectionError: If network or server errors persist after retries.
+        """
+        return await self._generate_async(self._build_contents(prompt, image), response_schema)
+    
+    @_retry_api_call
+    async def _generate_async(self, contents: List[Any], response_schema: Optional[Any]) -> Optional[str]:
+        """Async counterpart of ``_generate``."""
+        await self._limiter.acquire_async()
+        started = time.perf_counter()
+        text, error = None, None
+        try:
+            response = await self.client.aio.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=self._json_config(response_schema)
+            )
+            text = response.text if response.text else None
+            return text
+        except Exception as e:
+            error = type(e).__name__
+            logger.error(f"Gemini API call failed: {e}")
+            _raise_if_retryable(e)
+            return None
+        finally:
+            record_call(self.model, contents[0], text, started, error=error)
+    
+    def submit_batch(self, prompts: List[str], response_schema: Optional[Any] = None,
+                     poll_interval: float = 5.0, max_poll_interval: float = 60.0) -> List[Optional[str]]:
+        """Generate content for several prompts through the Gemini Batch API.
+        
+        Batch jobs are billed at a discount and avoid one round-trip per prompt,
+        but complete asynchronously, so this blocks while polling the job with
+        exponential backoff.
+        
+        Args:
+            prompts: Text prompts to generate content for.
+            response_schema: Optional type describing the expected JSON output.
+            poll_interval: Initial delay between job status checks, in seconds.
+            max_poll_interval: Upper bound on the delay between status checks.
+            
+        Returns:
+            Generated text for each prompt, in order (None where generation failed).
+        """
+        if not prompts:
+            return []
+        config = self._json_config(response_schema)
+        requests = [{'contents': [{'parts': [{'text': prompt}], 'role': 'user'}], 'config': config}
+                    for prompt in prompts]
+        try:
+            job = self.client.batches.create(model=self.model, src=requests)
+            logger.info(f"Submitted Gemini batch {job.name} with {len(prompts)} requests")
+            delay = poll_interval
+            while job.state.name not in _BATCH_DONE_STATES:
+                time.sleep(delay)
+                delay = min(delay * 2, max_poll_interval)
+                job = self.client.batches.get(name=job.name)
+        except Exception as e:
+            logger.error(f"Gemini batch submission failed: {e}")
+            return [None] * len(prompts)
+        
+        if job.state.name != 'JOB_STATE_SUCCEEDED':
+            logger.error(f"Gemini batch {job.name} finished with state {job.state.name}")
+            return [None] * len(prompts)
+        
+        results = []
+        for item in job.dest.inlined_responses:
+            if item.response is not None and item.response.text:
+                results.append(item.response.text)
+            else:
+                logger.warning(f"Gemini batch request failed: {item.error}")
+                results.append(None)
+        return results
@@ -3,16 +3,13 @@ import logging
 import base64
 import io
 from tenacity import retry, stop_after_attempt, wait_exponential
+import openai
 from openai import OpenAI
 from PIL import Image
-from typing import Optional
+from typing import Any, Optional
 from .ai_api_interface import AIAPIInterface
+from .errors import APIConnectionError, RateLimitError
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 logging.getLogger("openai").setLevel(logging.WARNING)
@@ -57,17 +54,25 @@ class OpenAIAPI(AIAPIInterface):
     
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        reraise=True
     )
-    def generate_content(self, prompt: str, image: Optional[Image.Image] = None) -> Optional[str]:
+    def generate_content(self, prompt: str, image: Optional[Image.Image] = None,
+                         response_schema: Optional[Any] = None) -> Optional[str]:
         """Generate content using the OpenAI API with retry logic.
         
         Args:
             prompt: The text prompt for content generation.
             image: Optional PIL Image object to include in the generation.
+            response_schema: Optional type describing the expected JSON output. Text
+                requests then use JSON mode, so the reply is a bare JSON object.
             
         Returns:
             Generated text content or None if generation fails.
+            
+        Raises:
+            RateLimitError: If the rate limit is still hit after retries.
+            APIConnectionError: If network or server errors persist after retries.
         """
         try:
             if image:
@@ -93,13 +98,21 @@ class OpenAIAPI(AIAPIInterface):
                 messages = [
                     {"role": "user", "content": prompt}
                 ]
+                extra = {"response_format": {"type": "json_object"}} if response_schema is not None else {}
                 response = self.client.chat.completions.create(
                     model=self.model,
                     reasoning_effort="high",
                     messages=messages,
+                    **extra,
                 )
 
                 return response.choices[0].message.content if response.choices else None
+        except openai.RateLimitError as e:
+            logger.error(f"OpenAI API call failed: {e}")
+            raise RateLimitError(str(e)) from e
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            logger.error(f"OpenAI API call failed: {e}")
+            raise APIConnectionError(str(e)) from e
         except Exception as e:
             logger.error(f"OpenAI API call failed: {e}")
             raise 
\ No newline at end of file
@@ -1,12 +1,18 @@
 """Processing modules for Slide2Thesis document generation pipeline."""
 
-from .text_extractor import TextExtractor
-from .page_classifier import PageClassifier
-from .chapter_generator import ChapterGenerator
-from .citation_generator import CitationGenerator
-from .figure_generator import FigureGenerator
-from .yaml_metadata_generator import YamlMetadataGenerator
-from .thesis_compiler import ThesisCompiler
+import importlib
+
+# Submodules are imported on first attribute access (PEP 562) so that importing
+# the package does not pull in every provider SDK and processing dependency.
+_lazy = {
+    'TextExtractor': '.text_extractor',
+    'PageClassifier': '.page_classifier',
+    'ChapterGenerator': '.chapter_generator',
+    'CitationGenerator': '.citation_generator',
+    'FigureGenerator': '.figure_generator',
+    'YamlMetadataGenerator': '.yaml_metadata_generator',
+    'ThesisCompiler': '.thesis_compiler',
+}
 
 __all__ = [
     'TextExtractor',
@@ -16,4 +22,15 @@ __all__ = [
     'FigureGenerator',
     'YamlMetadataGenerator',
     'ThesisCompiler',
-] 
\ No newline at end of file
+]
+
+def __getattr__(name):
+    if name in _lazy:
+        module = importlib.import_module(_lazy[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
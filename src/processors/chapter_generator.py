@@ -1,40 +1,27 @@
 import os
+import re
+import functools
 import logging
-from typing import Dict, Optional
+from pathlib import Path
+from typing import Dict, Final, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from ..ai.ai_api_interface import AIAPIInterface
+from ..ai._cache import cached_generate
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-class ChapterGenerator:
-    """Generates thesis chapters from classified sections."""
-    
-    def __init__(self, ai_api: AIAPIInterface):
-        """Initialize the ChapterGenerator.
-        
-        Args:
-            ai_api: Instance of AIAPIInterface for chapter generation.
-        """
-        self.ai_api = ai_api
-        self.categories = ['introduction', 'related works', 'methods', 'results', 'conclusions', 'appendix']
-        
-    def generate_chapter(self, section_content: str, chapter_type: str) -> Optional[str]:
-        """Generate a single chapter from section content.
-        
-        Args:
-            section_content: Content of the section.
-            chapter_type: Type of chapter ('introduction', 'methods', etc.).
-            
-        Returns:
-            Generated chapter text or None if generation fails.
-        """
-        # Define general thesis chapter guidelines
-        general_guidelines = """You are an expert academic writer tasked with composing a world-class thesis chapter. You are provided with a set of page contents relevant to this {chapter_type} chapter. Your job is to integrate, refine, and expand on this material to create a polished, coherent, and comprehensive chapter that meets high thesis standards.
+_math_formatter = None
+
+def _get_math_formatter():
+    """Return the shared MathFormatter, importing and creating it on first use."""
+    global _math_formatter
+    if _math_formatter is None:
+        from ..utils.math_formatter import MathFormatter
+        _math_formatter = MathFormatter()
+    return _math_formatter
+
+# Prompt scaffolding shared by every chapter; only the section content varies per call
+_GENERAL_GUIDELINES: Final = """You are an expert academic writer tasked with composing a world-class thesis chapter. You are provided with a set of page contents relevant to this {chapter_type} chapter. Your job is to integrate, refine, and expand on this material to create a polished, coherent, and comprehensive chapter that meets high thesis standards.
 
         Please follow these general guidelines:
         1. Carefully review all provided page contents and write a world-class thesis for this {chapter_type} chapter.
@@ -48,57 +35,50 @@ class ChapterGenerator:
         9. Always start the markdown with a chapter title (e.g., # Introduction, # Related Works, # Methods, # Results, # Conclusions, # Appendix)
         """
 
-        # Define chapter-specific guidelines
-        specific_guidelines = {
-            'introduction': """Chapter-Specific guidelines: 
+_SPECIFIC_GUIDELINES: Final = {
+    'introduction': """Chapter-Specific guidelines: 
             - Provides comprehensive background information necessary for understanding the the research problem
             - Keywords and background knowledge in the provided page contents must be introduced in this chapter.
             - Expand the background knowledge required to understand the keywords and research problem using your knowledge base. Don't limited to the provided page contents.
             - Comprehensively describe the importance, impact, and current challenges or limitations of the research problem.
             - This chapter should be ended with a concise statement of the research problem and the goal of the thesis.
             - Write 5-6 paragraphs for the introduction chapter""",
-            
-            'related works': """Chapter-Specific guidelines:
+
+    'related works': """Chapter-Specific guidelines:
             - Introduces related works and literature review and their limitations from the provided page contents
             - Expand the related works and literature review using your knowledge base. Don't limited to the provided page contents
             - Write 3-4 paragraphs for the related works chapter""",
 
-            'methods': """Chapter-Specific guidelines:
+    'methods': """Chapter-Specific guidelines:
             - Don't miss any details in each page content. Write each part as detailed as possible and expand the details using your knowledge base.""",
 
-            'results': """Chapter-Specific guidelines:
+    'results': """Chapter-Specific guidelines:
             - Present each result page as detailed as possible. Remember to summarize the key messages of the results at the end of the paragraph or section.
             - If a result page contains a figure, describe the figure like a the main body of a scientific paper.
             - If a result page contains a table, describe the table like a the main body of a scientific paper.
             - You can fill in the details of the results using your knowledge base.""",
 
-            'conclusions': """Chapter-Specific Considerations:
+    'conclusions': """Chapter-Specific Considerations:
             - This is the ending chapter of the thesis. Briefly summarize the main findings, interpretations of the results, implications of the research, and potential future directions.
             - Write 3-4 paragraphs for the conclusions chapter.
             - You can fill in the details of the conclusions using your knowledge base.""",
 
-            'appendix': """Chapter-Specific Considerations:
+    'appendix': """Chapter-Specific Considerations:
             - This is appendix of the thesis which includes supplementary information from pages after the conclusion. 
             - If the page contains a figure, write a complete figure legend explaining the figure.
             - If the page contains a table, write a complete table legend explaining the table. Formulate the tables in markdown format."""
-        }
+}
 
-        prompt = (f"{general_guidelines}\n\n{specific_guidelines.get(chapter_type, '')}"
-                f"\n\nBelow are the extracted text pages for the {chapter_type} chapter:\n\n{section_content}\n\nPlease generate a comprehensive {chapter_type} chapter based on above guidelines and content.")
-        
-        return self.ai_api.generate_content(prompt)
-        
-    def check_and_expand_chapter(self, section_content: str, chapter_text: str) -> str:
-        """Check for missing content and expand if necessary.
-        
-        Args:
-            section_content: Original content from the section file.
-            chapter_text: Generated chapter text.
-            
-        Returns:
-            Expanded chapter text including any missing content.
-        """
-        prompt = """You are an expert academic writer. Compare the original contents and the generated chapter text below. 
+_COVERAGE_CHECK_INSTRUCTIONS: Final = """Coverage check:
+            - After drafting, re-read the extracted text pages and make sure no content from them is missing in the chapter.
+            - If anything is missing, expand the chapter to include it while keeping the flow and academic writing style."""
+
+_ONESHOT_POLISH_INSTRUCTIONS: Final = """Final polish:
+            - Convert any slide-based language into professional thesis writing and keep a consistent academic tone.
+            - Keep all technical content, equations and important information; keep equations in LaTeX format ($ for inline, $$ for display).
+            - Return only the final chapter in markdown format, without editing artifacts (e.g., "Here's the expanded chapter text")."""
+
+_EXPAND_PROMPT: Final = """You are an expert academic writer. Compare the original contents and the generated chapter text below. 
         Your task is to:
         1. Identify any content from the original contents that is missing in the generated chapter text
         2. If any missing content is found, expand the generated chapter text to include this missing content while maintaining the original flow and academic writing style
@@ -111,24 +91,8 @@ class ChapterGenerator:
         **Generated chapter text:**
         {chapter_text}
         """
-        
-        expanded_text = self.ai_api.generate_content(prompt.format(
-            section_content=section_content,
-            chapter_text=chapter_text
-        ))
-        
-        return expanded_text if expanded_text else chapter_text
-        
-    def polish_thesis_content(self, chapter_text: str) -> str:
-        """Polish thesis chapter content.
-        
-        Args:
-            chapter_text: The chapter text to polish.
-            
-        Returns:
-            Polished chapter text.
-        """
-        prompt = """You are an expert academic thesis editor. Polish the following thesis chapter to meet the highest academic standards.
+
+_POLISH_PROMPT: Final = """You are an expert academic thesis editor. Polish the following thesis chapter to meet the highest academic standards.
 
         Guidelines:
         1. Convert any slide-based language into professional thesis writing
@@ -145,87 +109,238 @@ class ChapterGenerator:
         Chapter content to polish:
         {chapter_text}"""
 
-        polished_text = self.ai_api.generate_content(prompt.format(chapter_text=chapter_text))
+# Slide-style artifacts that warrant a full model polish pass
+_SLIDE_MARKERS: Final = re.compile(r'\b(slides?|bullet points?|click|presentation|see next page)\b', re.I)
+
+# Markdown code fences the model sometimes wraps its answer in
+_MD_FENCE_RE: Final = re.compile(r'```(?:markdown\n?)?')
+
+@functools.lru_cache(maxsize=16)
+def _fmt_general(chapter_type: str) -> str:
+    """Return the general guidelines formatted for a chapter type."""
+    return _GENERAL_GUIDELINES.format(chapter_type=chapter_type)
+
+class ChapterGenerator:
+    """Generates thesis chapters from classified sections."""
+    
+    def __init__(self, ai_api: AIAPIInterface, polish: bool = False):
+        """Initialize the ChapterGenerator.
+        
+        Args:
+            ai_api: Instance of AIAPIInterface for chapter generation.
+            polish: Whether to run the separate generate -> expand -> polish passes
+                instead of a single combined model call per chapter (default: False).
+        """
+        self.ai_api = ai_api
+        self.polish = polish
+        self.categories = ['introduction', 'related works', 'methods', 'results', 'conclusions', 'appendix']
+        # File name stem for each category (e.g. 'related works' -> 'related_works')
+        self._slug = {category: category.lower().replace(' ', '_') for category in self.categories}
+        
+    def _build_chapter_prompt(self, section_content: str, chapter_type: str, extra_instructions: str = "") -> str:
+        """Build the chapter generation prompt.
+        
+        Args:
+            section_content: Content of the section.
+            chapter_type: Type of chapter ('introduction', 'methods', etc.).
+            extra_instructions: Optional instructions appended after the chapter-specific guidelines.
+            
+        Returns:
+            The complete prompt string.
+        """
+        if extra_instructions:
+            extra_instructions = f"\n\n{extra_instructions}"
+            
+        return (f"{_fmt_general(chapter_type)}\n\n{_SPECIFIC_GUIDELINES.get(chapter_type, '')}{extra_instructions}"
+                f"\n\nBelow are the extracted text pages for the {chapter_type} chapter:\n\n{section_content}\n\nPlease generate a comprehensive {chapter_type} chapter based on above guidelines and content.")
+        
+    def generate_chapter(self, section_content: str, chapter_type: str) -> Optional[str]:
+        """Generate a single chapter from section content.
+        
+        Args:
+            section_content: Content of the section.
+            chapter_type: Type of chapter ('introduction', 'methods', etc.).
+            
+        Returns:
+            Generated chapter text or None if generation fails.
+        """
+        return cached_generate(self.ai_api, self._build_chapter_prompt(section_content, chapter_type))
+        
+    def generate_chapter_oneshot(self, section_content: str, chapter_type: str) -> Optional[str]:
+        """Generate a finished chapter from section content in a single model call.
+        
+        The prompt asks the model to draft, self-check coverage against the source
+        (methods and results only) and polish in one pass, replacing the separate
+        generate, expand and polish round-trips.
+        
+        Args:
+            section_content: Content of the section.
+            chapter_type: Type of chapter ('introduction', 'methods', etc.).
+            
+        Returns:
+            Polished chapter text or None if generation fails.
+        """
+        extra_instructions = []
+        if chapter_type in ['methods', 'results']:
+            extra_instructions.append(_COVERAGE_CHECK_INSTRUCTIONS)
+        extra_instructions.append(_ONESHOT_POLISH_INSTRUCTIONS)
+        
+        prompt = self._build_chapter_prompt(section_content, chapter_type, "\n\n".join(extra_instructions))
+        chapter_text = cached_generate(self.ai_api, prompt)
+        return self._finalize_text(chapter_text) if chapter_text else None
+        
+    def check_and_expand_chapter(self, section_content: str, chapter_text: str) -> str:
+        """Check for missing content and expand if necessary.
+        
+        Args:
+            section_content: Original content from the section file.
+            chapter_text: Generated chapter text.
+            
+        Returns:
+            Expanded chapter text including any missing content.
+        """
+        expanded_text = cached_generate(self.ai_api, _EXPAND_PROMPT.format(
+            section_content=section_content,
+            chapter_text=chapter_text
+        ))
+        
+        return expanded_text if expanded_text else chapter_text
+        
+    def polish_thesis_content(self, chapter_text: str) -> str:
+        """Polish thesis chapter content.
+        
+        The model polish pass only runs when the text still contains slide-style
+        artifacts; otherwise only the local cleanup and math formatting are applied.
         
+        Args:
+            chapter_text: The chapter text to polish.
+            
+        Returns:
+            Polished chapter text.
+        """
+        if not _SLIDE_MARKERS.search(chapter_text):
+            logger.debug("No slide artifacts found, skipping model polish pass")
+            return self._finalize_text(chapter_text)
+        
+        polished_text = cached_generate(self.ai_api, _POLISH_PROMPT.format(chapter_text=chapter_text))
+        
+        return self._finalize_text(polished_text) if polished_text else chapter_text
+    
+    def _finalize_text(self, chapter_text: str) -> str:
+        """Strip markdown code block markers and apply local math formatting.
+        
+        Args:
+            chapter_text: Chapter text returned by the model.
+            
+        Returns:
+            Cleaned chapter text.
+        """
         # Clean up any remaining markdown code block markers
-        if polished_text:
-            polished_text = polished_text.replace('```markdown\n', '').replace('```', '').strip()
+        chapter_text = _MD_FENCE_RE.sub('', chapter_text).strip()
         
         # Apply math formatting as final step
+        math_formatter = _get_math_formatter()
         try:
-            from ..utils.math_formatter import MathFormatter
-            math_formatter = MathFormatter()
-            polished_text = math_formatter.format_content(polished_text)
+            chapter_text = math_formatter.format_content(chapter_text)
             logger.debug("Applied math formatting to chapter content")
         except Exception as e:
             logger.warning(f"Math formatting failed: {e}")
             # Continue without math formatting if it fails
         
-        return polished_text if polished_text else chapter_text
+        return chapter_text
     
-    def _generate_single_chapter_task(self, category: str, working_dir: str) -> tuple[str, Optional[str]]:
-        """Generate a single chapter task for concurrent execution.
+    def _load_sections(self, working_dir: str) -> List[Tuple[str, str]]:
+        """Read all section files, skipping missing or empty ones.
         
         Args:
-            category: Chapter category to generate.
             working_dir: Directory containing section files.
             
         Returns:
-            Tuple of (category, generated_chapter_content) or (category, None) if failed.
+            List of (category, section_content) tuples in category order.
         """
-        section_file = os.path.join(working_dir, f"{category.lower().replace(' ', '_')}_section.txt")
-        if not os.path.exists(section_file):
-            logger.info(f"Skipping {category} - section file not found")
-            return category, None
-            
-        # Read the content and check if it's empty
-        with open(section_file, 'r', encoding='utf-8') as f:
-            section_content = f.read().strip()
-        
-        # Skip if the section content is empty
-        if not section_content:
-            logger.info(f"Skipping empty {category} section")
-            return category, None
-        
-        # Generate initial chapter
-        chapter_text = self.generate_chapter(section_content, category)
-        if not chapter_text:
-            logger.error(f"Failed to generate {category} chapter")
-            return category, None
+        # List the directory once instead of probing each section file
+        present = {entry.name for entry in os.scandir(working_dir) if entry.is_file()}
+        
+        sections = []
+        for category in self.categories:
+            section_name = f"{self._slug[category]}_section.txt"
+            if section_name not in present:
+                logger.info(f"Skipping {category} - section file not found")
+                continue
+                
+            # Read the content and check if it's empty
+            section_content = Path(working_dir, section_name).read_text(encoding='utf-8').strip()
             
-        # Double check and expand chapter content for methods and results
-        if category in ['methods', 'results']:
-            logger.info(f"Double checking and expanding {category} chapter")
-            chapter_text = self.check_and_expand_chapter(section_content, chapter_text)
+            # Skip if the section content is empty
+            if not section_content:
+                logger.info(f"Skipping empty {category} section")
+                continue
+                
+            sections.append((category, section_content))
+        return sections
+    
+    def _generate_one(self, category: str, section_content: str, working_dir: str) -> tuple[str, Optional[str]]:
+        """Generate and save a single chapter (for concurrent execution).
+        
+        Args:
+            category: Chapter category to generate.
+            section_content: Content of the section file for this category.
+            working_dir: Directory where the chapter file will be written.
             
-        # Polish the chapter content
-        chapter_text = self.polish_thesis_content(chapter_text)
+        Returns:
+            Tuple of (category, generated_chapter_content) or (category, None) if failed.
+        """
+        if not self.polish:
+            # Generate, self-check and polish in a single model call
+            chapter_text = self.generate_chapter_oneshot(section_content, category)
+            if not chapter_text:
+                logger.error(f"Failed to generate {category} chapter")
+                return category, None
+        else:
+            # Generate initial chapter
+            chapter_text = self.generate_chapter(section_content, category)
+            if not chapter_text:
+                logger.error(f"Failed to generate {category} chapter")
+                return category, None
+                
+            # Double check and expand chapter content for methods and results
+            if category in ['methods', 'results']:
+                logger.info(f"Double checking and expanding {category} chapter")
+                chapter_text = self.check_and_expand_chapter(section_content, chapter_text)
+                
+            # Polish the chapter content
+            chapter_text = self.polish_thesis_content(chapter_text)
         
         # Save the chapter
-        output_file = os.path.join(working_dir, f"{category.lower().replace(' ', '_')}_chapter.md")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(chapter_text)
+        output_file = os.path.join(working_dir, f"{self._slug[category]}_chapter.md")
+        Path(output_file).write_text(chapter_text, encoding='utf-8')
             
         logger.info(f"Generated {category} chapter: {output_file}")
         return category, chapter_text
         
-    def generate_all_chapters(self, working_dir: str, threads: int = 1) -> Dict[str, str]:
+    def generate_all_chapters(self, working_dir: str, threads: int = 4) -> Dict[str, str]:
         """Generate all chapters from section files.
         
+        Section files are read up front; the per-chapter model calls are then
+        run concurrently since they are independent I/O-bound requests. A thread
+        pool is enough here: there are only a handful of chapters, each a short
+        chain of dependent calls, so an event loop would add nothing.
+        
         Args:
             working_dir: Directory containing section files and where chapter files will be written.
-            threads: Number of threads to use for concurrent generation (default: 1 for sequential).
+            threads: Number of threads to use for concurrent generation (default: 4, 1 for sequential).
             
         Returns:
             Dictionary mapping categories to generated chapter content.
         """
         generated_chapters = {}
+        sections = self._load_sections(working_dir)
         
         if threads <= 1:
             # Sequential processing (original behavior)
             logger.info("Generating chapters sequentially...")
-            for category in self.categories:
-                category_result, chapter_text = self._generate_single_chapter_task(category, working_dir)
+            for category, section_content in sections:
+                category_result, chapter_text = self._generate_one(category, section_content, working_dir)
                 if chapter_text:
                     generated_chapters[category_result] = chapter_text
         else:
@@ -234,8 +349,8 @@ class ChapterGenerator:
             with ThreadPoolExecutor(max_workers=threads) as executor:
                 # Submit all chapter generation tasks
                 future_to_category = {
-                    executor.submit(self._generate_single_chapter_task, category, working_dir): category
-                    for category in self.categories
+                    executor.submit(self._generate_one, category, section_content, working_dir): category
+                    for category, section_content in sections
                 }
                 
                 # Collect results as they complete
@@ -250,4 +365,4 @@ class ChapterGenerator:
                         logger.error(f"Error generating {category} chapter: {str(e)}")
                         
         logger.info(f"Generated {len(generated_chapters)} chapters total")
-        return generated_chapters 
\ No newline at end of file
+        return generated_chapters
@@ -1,37 +1,355 @@
 import json
+import hashlib
 import re
+import asyncio
 import os
+import shutil
+import unicodedata
 import logging
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Dict, Final, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from Bio import Entrez
-import time
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 from ..ai.ai_api_interface import AIAPIInterface
-import urllib.request
+from ..ai._cache import cached_generate_async
+from ..utils.pubmed_cache import PubMedCache
+import http.client
+import threading
+import time
+from collections import deque
 import urllib.parse
 import urllib.error
+import xml.etree.ElementTree as ET
+
+try:
+    # Optional faster parser; its JSONDecodeError subclasses json.JSONDecodeError
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+_EUTILS_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+_GOOGLE_CSE_URL = "https://www.googleapis.com/customsearch/v1"
+# NCBI allows 3 E-utilities requests per second without an API key and 10 with one
+_PUBMED_CONCURRENCY = 3
+_PUBMED_CONCURRENCY_WITH_KEY = 10
+# Concurrent AI analysis calls per unit of the threads setting
+_ANALYSIS_WORKERS = 4
+_WHITESPACE_RE = re.compile(r'\s+')
+_CITED_AFTER_RE = re.compile(r'\s*\[@')
+# Sentence-ending punctuation that citations are inserted before
+_PUNCT = frozenset('.,;')
+_JSON_DECODER = json.JSONDecoder()
+_BIBKEY_SANITIZE = re.compile(r'[^a-z0-9]')
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+# LaTeX escapes for BibTeX fields, applied with str.translate
+_BIBTEX_JOURNAL_ESCAPES = str.maketrans({
+    "\\": "\\textbackslash",
+    "&": "\\&",
+    "%": "\\%",
+    "$": "\\$",
+    "#": "\\#",
+    "_": "\\_",
+    "{": "\\{",
+    "}": "\\}",
+})
+_BIBTEX_TITLE_ESCAPES = {
+    **_BIBTEX_JOURNAL_ESCAPES,
+    **str.maketrans({"~": "\\textasciitilde", "^": "\\textasciicircum"}),
+}
+# Common PubMed URL patterns
+_PUBMED_URL_PATTERNS = (
+    re.compile(r'pubmed\.ncbi\.nlm\.nih\.gov/(\d+)'),  # /12345678
+    re.compile(r'pubmed\.ncbi\.nlm\.nih\.gov/\?term=(\d+)'),  # ?term=12345678
+    re.compile(r'pubmed\.ncbi\.nlm\.nih\.gov/\?linkname=pubmed_pubmed&from_uid=(\d+)'),  # from_uid=12345678
+)
+# Fixed instructions come first and the chapter text last, so every analysis request
+# shares the same prompt prefix and can hit the provider's implicit prompt cache
+_CITATION_ANALYSIS_PROMPT: Final = """Analyze this thesis text and identify sentences that likely require citations.
+Focus on factual claims, established concepts, technical challenges, and specific examples.
+
+**IMPORTANT**: Do not include citations within mathematical equations or environments. 
+
+Respond with ONLY a valid JSON object in this exact format:
+{
+    "sentences": [
+        {
+            "sentence": "exact sentence from text",
+            "reason": "brief reason for citation",
+            "key_terms": ["term1", "term2"]
+        }
+    ]
+}
+
+
+Text:
+"""
+# Bump when the stored citation state format or the analysis prompt changes
+_CITATION_STATE_VERSION = 1
+
+def _is_transient(exc: BaseException) -> bool:
+    """Return True for HTTP failures worth retrying (429, 5xx, network errors)."""
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code == 429 or exc.code >= 500
+    return isinstance(exc, (OSError, http.client.HTTPException))
+
+_backoff = wait_exponential_jitter(initial=1, max=10)
+
+def _wait_retry_after(retry_state) -> float:
+    """Wait as long as a 429/503 Retry-After header asks, else back off exponentially."""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, urllib.error.HTTPError) and exc.headers:
+        retry_after = exc.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), 60.0)
+    return _backoff(retry_state)
+
+class _RateLimiter:
+    """Thread-safe sliding-window limiter allowing at most `rate` calls per second."""
+    
+    def __init__(self, rate: int):
+        self.rate = rate
+        self._calls = deque()
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+    
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for `seconds`, e.g. after the server throttled us."""
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+    
+    def acquire(self) -> None:
+        """Block until another call fits in the current one-second window."""
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._resume_at:
+                    time.sleep(self._resume_at - now)
+                    continue
+                while self._calls and now - self._calls[0] >= 1.0:
+                    self._calls.popleft()
+                if len(self._calls) < self.rate:
+                    self._calls.append(now)
+                    return
+                # Sleeping under the lock keeps waiting callers in FIFO order
+                time.sleep(1.0 - (now - self._calls[0]))
+
+def _log_retry(retry_state) -> None:
+    """Log a retry before tenacity sleeps."""
+    logger.warning("Retrying HTTP request, attempt %s", retry_state.attempt_number)
+
+# Retry policy shared by all citation HTTP requests
+_RETRY_POLICY = dict(
+    stop=stop_after_attempt(3),
+    wait=_wait_retry_after,
+    retry=retry_if_exception(_is_transient),
+    reraise=True
+)
+
+# Keep-alive HTTPS connections, one per host and thread (http.client is not thread-safe)
+_connections = threading.local()
+
+def _http_request(url: str, data: Optional[bytes] = None, timeout: float = 30) -> bytes:
+    """Fetch a URL once over a reused keep-alive connection.
+    
+    Args:
+        url: HTTPS URL to request
+        data: Optional form-encoded body; the request is a POST when given
+        timeout: Socket timeout in seconds
+        
+    Returns:
+        Response body
+        
+    Raises:
+        urllib.error.HTTPError: If the server answers with an error status
+    """
+    parts = urllib.parse.urlsplit(url)
+    pool = getattr(_connections, "pool", None)
+    if pool is None:
+        pool = _connections.pool = {}
+    conn = pool.get(parts.netloc)
+    if conn is None:
+        conn = pool[parts.netloc] = http.client.HTTPSConnection(parts.netloc, timeout=timeout)
+        
+    target = f"{parts.path}?{parts.query}" if parts.query else parts.path
+    headers = {"Content-Type": "application/x-www-form-urlencoded"} if data is not None else {}
+    try:
+        conn.request("POST" if data is not None else "GET", target, body=data, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+    except (OSError, http.client.HTTPException):
+        # Drop the broken connection; a retry opens a fresh one
+        conn.close()
+        pool.pop(parts.netloc, None)
+        raise
+        
+    if response.status >= 400:
+        raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+    return body
+
+def _validate_sentence_entries(entries: List) -> List[Dict]:
+    """Keep well-formed citation entries, normalized to the fields used downstream.
+    
+    Each entry must have a non-empty "sentence" string; "key_terms" is reduced to
+    its non-empty strings and "reason" defaults to an empty string. Malformed
+    entries are dropped so later stages can index the fields directly.
+    
+    Args:
+        entries: Raw "sentences" list from the analysis response
+        
+    Returns:
+        List of entries with "sentence", "reason" and "key_terms" keys
+    """
+    valid = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        sentence = entry.get("sentence")
+        key_terms = entry.get("key_terms")
+        if not isinstance(sentence, str) or not sentence.strip() or not isinstance(key_terms, list):
+            continue
+        key_terms = [term for term in key_terms if isinstance(term, str) and term.strip()]
+        if not key_terms:
+            continue
+        reason = entry.get("reason")
+        valid.append({
+            "sentence": sentence,
+            "reason": reason if isinstance(reason, str) else "",
+            "key_terms": key_terms,
+        })
+    
+    dropped = len(entries) - len(valid)
+    if dropped:
+        logger.warning("Dropped %s malformed citation entries", dropped)
+    return valid
+
+def _extract_json_object(text: str) -> Optional[Dict]:
+    """Parse the first complete JSON object embedded in text.
+    
+    A response that is exactly one JSON object is parsed in one call. Otherwise
+    raw_decode runs from each '{' in turn; it stops at the end of the object,
+    so trailing prose or stray braces after it do not matter.
+    
+    Args:
+        text: Model response that should contain a JSON object
+        
+    Returns:
+        The parsed object, or None if the text contains none
+    """
+    # Fast path: the whole response is the JSON object (orjson when installed)
+    stripped = text.strip()
+    if stripped.startswith('{'):
+        try:
+            obj = _json_loads(stripped)
+            if isinstance(obj, dict):
+                return obj
+        except ValueError:
+            pass
+            
+    start = text.find('{')
+    while start >= 0:
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(text, start)
+            if isinstance(obj, dict):
+                return obj
+        except json.JSONDecodeError:
+            pass
+        start = text.find('{', start + 1)
+    return None
+
+def _query_key(key_terms: List[str]) -> Tuple[str, ...]:
+    """Normalize key terms so equivalent searches compare equal."""
+    return tuple(sorted({term.strip().lower() for term in key_terms}))
+
+def _split_chapter(text: str, max_chars: int = 4000) -> List[str]:
+    """Split chapter text into chunks of whole paragraphs.
+    
+    Paragraphs (separated by blank lines) are packed into chunks of at most
+    max_chars characters; a single longer paragraph becomes its own chunk.
+    
+    Args:
+        text: Chapter text
+        max_chars: Target maximum chunk size in characters
+        
+    Returns:
+        List of chunks, at least one
+    """
+    chunks = []
+    current = []
+    size = 0
+    for paragraph in text.split("\n\n"):
+        if current and size + len(paragraph) > max_chars:
+            chunks.append("\n\n".join(current))
+            current = []
+            size = 0
+        current.append(paragraph)
+        size += len(paragraph) + 2
+    chunks.append("\n\n".join(current))
+    return chunks
+
+def _insert_citations(text: str, replacements: Dict[str, str]) -> str:
+    """Replace the first uncited occurrence of each sentence in one pass.
+    
+    Occurrences are located with str.find and the output is assembled with a
+    single join. Where occurrences overlap, the leftmost wins and, at the same
+    position, the longest sentence wins. An occurrence already followed by a
+    citation ("[@") is left alone.
+    
+    Args:
+        text: Chapter text
+        replacements: Mapping of sentence to its cited replacement
+        
+    Returns:
+        Text with citations inserted
+    """
+    occurrences = []
+    for sentence in replacements:
+        start = text.find(sentence)
+        while start >= 0:
+            end = start + len(sentence)
+            if not _CITED_AFTER_RE.match(text, end):
+                occurrences.append((start, -len(sentence), sentence))
+            start = text.find(sentence, start + 1)
+    occurrences.sort()
+    
+    parts = []
+    cited = set()
+    position = 0
+    for start, neg_len, sentence in occurrences:
+        if start < position:
+            continue
+        parts.append(text[position:start])
+        # Only the first occurrence of each sentence gets the citation
+        parts.append(sentence if sentence in cited else replacements[sentence])
+        cited.add(sentence)
+        position = start - neg_len
+    parts.append(text[position:])
+    return "".join(parts)
+
 class CitationGenerator:
     """Generates and manages citations for thesis chapters."""
     
-    def __init__(self, ai_api: AIAPIInterface, email: str, google_api_key: str, google_engine_id: str):
+    def __init__(self, ai_api: AIAPIInterface, email: str, google_api_key: str, google_engine_id: str,
+                 ncbi_api_key: Optional[str] = None):
         """Initialize the CitationGenerator.
         
         Args:
             ai_api: Instance of AIAPIInterface for citation analysis
             email: Email for PubMed API access
+            ncbi_api_key: Optional NCBI API key, raising the PubMed limit from 3 to 10 requests/s
         """
         self.ai_api = ai_api
-        Entrez.email = email
+        self.email = email
+        self.ncbi_api_key = ncbi_api_key
+        self._search_workers = _PUBMED_CONCURRENCY_WITH_KEY if ncbi_api_key else _PUBMED_CONCURRENCY
+        # Concurrency alone does not bound the request rate when responses are fast
+        self._eutils_limiter = _RateLimiter(self._search_workers)
         self.google_api_key = google_api_key
         self.google_engine_id = google_engine_id
+        self._cache: Optional[PubMedCache] = None
+        self._search_executor: Optional[ThreadPoolExecutor] = None
+        # Chapter text read during analysis, reused when inserting citations
+        self._chapter_text_cache: Dict[str, str] = {}
         
     def process_chapters(self, debug_folder: str, threads: int = 1) -> bool:
         """Process all chapter files in the debug folder and add citations.
@@ -46,47 +364,121 @@ class CitationGenerator:
         try:
             # Find all chapter markdown files
             citation_chapters = ['introduction', 'related_works', 'results']
-            chapter_files = [f for f in os.listdir(debug_folder) 
-                           if f.endswith('_chapter.md')]
+            with os.scandir(debug_folder) as entries:
+                chapter_files = sorted(entry.name for entry in entries
+                                       if entry.name.endswith('_chapter.md') and entry.is_file())
             
             if not chapter_files:
-                logger.error(f"No chapter files found in {debug_folder}")
+                logger.error("No chapter files found in %s", debug_folder)
                 return False
+            
+            self._chapter_text_cache.clear()
+            
+            # PubMed results are cached per debug folder so re-runs skip the network
+            self._cache = PubMedCache(os.path.join(debug_folder, ".pubmed_cache.db"),
+                                      refresh=os.getenv('AI_CACHE_FORCE_REFRESH') == '1')
+            # One bounded pool serves the searches of all chapters, so concurrent chapters
+            # share the NCBI allowance and each worker's keep-alive connection
+            self._search_executor = ThreadPoolExecutor(max_workers=self._search_workers,
+                                                       thread_name_prefix='pubmed-search')
                 
-            all_papers = []
+            citation_files = [f for f in chapter_files if f.replace('_chapter.md', '') in citation_chapters]
+            
+            # Non-citation chapters get a _cited version without modifications
+            for chapter_file in chapter_files:
+                if chapter_file not in citation_files:
+                    self._copy_uncited_chapter(chapter_file, debug_folder)
+            
+            # Chapters unchanged since the last run reuse their stored analysis and search results
             citation_data_by_chapter = {}
+            sentence_pmids_by_chapter = {}
+            chapter_hashes = {}
+            to_analyze = []
+            for chapter_file in citation_files:
+                chapter_hash, state = self._load_citation_state(os.path.join(debug_folder, chapter_file))
+                chapter_hashes[chapter_file] = chapter_hash
+                if state:
+                    citation_data_by_chapter[chapter_file], sentence_pmids_by_chapter[chapter_file] = state
+                    logger.info("Chapter unchanged, reusing citations for %s", chapter_file)
+                else:
+                    to_analyze.append(chapter_file)
+            
+            # Analyze all changed chapters concurrently on one event loop
+            logger.info("Analyzing %s chapters for citations concurrently...", len(to_analyze))
+            analyses = asyncio.run(self._analyze_chapters_async(
+                [os.path.join(debug_folder, f) for f in to_analyze],
+                max(1, threads) * _ANALYSIS_WORKERS
+            ))
+            new_citation_data = {}
+            # Chapters whose analysis and searches all succeeded; only these are
+            # stored for reuse, so failures are retried on the next run
+            complete_chapters = set()
+            for chapter_file, analysis in zip(to_analyze, analyses):
+                if isinstance(analysis, Exception):
+                    logger.error("Error analyzing citations for %s: %s", chapter_file, analysis)
+                elif analysis:
+                    citation_data, analysis_complete = analysis
+                    new_citation_data[chapter_file] = citation_data
+                    if analysis_complete:
+                        complete_chapters.add(chapter_file)
+            citation_data_by_chapter.update(new_citation_data)
             
             if threads <= 1:
                 # Sequential processing (original behavior)
-                logger.info("Processing chapters sequentially for citations...")
-                for chapter_file in chapter_files:
-                    chapter_file_result, citation_data, papers = self._process_single_chapter_task(
-                        chapter_file, debug_folder, citation_chapters
-                    )
-                    if citation_data:
-                        citation_data_by_chapter[chapter_file_result] = citation_data
-                        all_papers.extend(papers)
+                logger.info("Searching citations sequentially...")
+                for chapter_file, citation_data in new_citation_data.items():
+                    sentence_pmids, search_complete = self._search_citations(citation_data)
+                    sentence_pmids_by_chapter[chapter_file] = sentence_pmids
+                    if not search_complete:
+                        complete_chapters.discard(chapter_file)
             else:
                 # Concurrent processing
-                logger.info(f"Processing chapters concurrently for citations using {threads} threads...")
+                logger.info("Searching citations concurrently using %s threads...", threads)
                 with ThreadPoolExecutor(max_workers=threads) as executor:
-                    # Submit all chapter processing tasks
+                    # Submit all chapter search tasks
                     future_to_chapter = {
-                        executor.submit(self._process_single_chapter_task, chapter_file, debug_folder, citation_chapters): chapter_file
-                        for chapter_file in chapter_files
+                        executor.submit(self._search_citations, citation_data): chapter_file
+                        for chapter_file, citation_data in new_citation_data.items()
                     }
                     
                     # Collect results as they complete
                     for future in as_completed(future_to_chapter):
                         chapter_file = future_to_chapter[future]
                         try:
-                            chapter_file_result, citation_data, papers = future.result()
-                            if citation_data:
-                                citation_data_by_chapter[chapter_file_result] = citation_data
-                                all_papers.extend(papers)
-                                logger.info(f"Completed citation processing for {chapter_file_result}")
+                            sentence_pmids, search_complete = future.result()
+                            sentence_pmids_by_chapter[chapter_file] = sentence_pmids
+                            if not search_complete:
+                                complete_chapters.discard(chapter_file)
+                            logger.info("Completed citation search for %s", chapter_file)
                         except Exception as e:
-                            logger.error(f"Error processing citations for {chapter_file}: {str(e)}")
+                            complete_chapters.discard(chapter_file)
+                            logger.error("Error searching citations for %s: %s", chapter_file, e)
+            
+            for chapter_file in new_citation_data:
+                if chapter_file not in complete_chapters:
+                    logger.warning("Citations for %s are incomplete; not storing them for reuse", chapter_file)
+                elif chapter_file in sentence_pmids_by_chapter:
+                    self._save_citation_state(
+                        os.path.join(debug_folder, chapter_file),
+                        chapter_hashes[chapter_file],
+                        citation_data_by_chapter[chapter_file],
+                        sentence_pmids_by_chapter[chapter_file]
+                    )
+            
+            # Fetch the details of every PMID found across all chapters in one batch
+            all_pmids = [pmid for sentence_pmids in sentence_pmids_by_chapter.values()
+                         for _, pmids in sentence_pmids for pmid in pmids]
+            papers_by_pmid = self._fetch_papers_batch(all_pmids)
+            
+            all_papers = []
+            for chapter_file in chapter_files:
+                for sentence, pmids in sentence_pmids_by_chapter.get(chapter_file, []):
+                    for pmid in pmids:
+                        paper = papers_by_pmid.get(pmid)
+                        if paper:
+                            # Store the sentence for mapping
+                            all_papers.append({**paper, "sentence": sentence})
+                            logger.info("Added paper: %s (%s)", paper['title'], paper['year'])
             
             if not all_papers:
                 logger.warning("No citations were generated for any chapter")
@@ -109,196 +501,260 @@ class CitationGenerator:
                     chapter_path,
                     citation_data,
                     bibtex_keys,
-                    debug_folder
+                    debug_folder,
+                    chapter_text=self._chapter_text_cache.pop(chapter_path, None)
                 )
                 
             logger.info("Successfully processed all chapters for citations")
             return True
             
         except Exception as e:
-            logger.error(f"Error processing chapters for citations: {e}")
+            logger.error("Error processing chapters for citations: %s", e)
             return False
+        finally:
+            if self._search_executor:
+                self._search_executor.shutdown()
+                self._search_executor = None
+            if self._cache:
+                self._cache.close()
+                self._cache = None
             
-    def _analyze_chapter(self, chapter_path: str) -> Optional[Dict]:
+    async def _analyze_chapter_async(self, chapter_path: str,
+                                     semaphore: asyncio.Semaphore) -> Optional[Tuple[Dict, bool]]:
         """Analyze a chapter file for sentences requiring citations.
         
         Args:
             chapter_path: Path to the chapter markdown file
+            semaphore: Bounds the number of AI requests in flight
             
         Returns:
-            Dictionary containing citation analysis or None if analysis fails
+            Tuple of (citation analysis, whether every chunk was analyzed), or None
+            if the chapter could not be read
         """
         if not os.path.exists(chapter_path):
-            logger.error(f"Chapter file not found: {chapter_path}")
+            logger.error("Chapter file not found: %s", chapter_path)
             return None
             
         try:
-            with open(chapter_path, "r", encoding="utf-8") as f:
-                chapter_text = f.read()
+            chapter_text = self._chapter_text_cache.get(chapter_path)
+            if chapter_text is None:
+                chapter_text = Path(chapter_path).read_bytes().decode("utf-8")
+                self._chapter_text_cache[chapter_path] = chapter_text
                 
-            citation_data = self._analyze_citations(chapter_text)
-            logger.info(f"Analyzed citations for {os.path.basename(chapter_path)}")
-            return citation_data
+            analysis = await self._analyze_citations_async(chapter_text, semaphore)
+            logger.info("Analyzed citations for %s", os.path.basename(chapter_path))
+            return analysis
             
         except Exception as e:
-            logger.error(f"Error analyzing chapter {chapter_path}: {e}")
+            logger.error("Error analyzing chapter %s: %s", chapter_path, e)
             return None
             
-    def _analyze_citations(self, text: str) -> Dict:
+    async def _analyze_citations_async(self, text: str, semaphore: asyncio.Semaphore) -> Tuple[Dict, bool]:
         """Analyze text for sentences requiring citations using AIAPI.
         
+        Long chapters are split on paragraph boundaries and the chunks are analyzed
+        concurrently; the sentence lists are merged in chapter order.
+        
         Args:
             text: Text content to analyze
+            semaphore: Bounds the number of AI requests in flight
             
         Returns:
-            Dictionary containing citation analysis
+            Tuple of (citation analysis, whether every chunk was analyzed); sentences
+            from chunks whose analysis failed are missing from the analysis
         """
-        prompt = """Analyze this thesis text and identify sentences that likely require citations.
-        Focus on factual claims, established concepts, technical challenges, and specific examples.
+        chunks = _split_chapter(text)
+        results = await asyncio.gather(*[self._analyze_chunk_async(chunk, semaphore) for chunk in chunks])
+            
+        sentences = []
+        seen = set()
+        for chunk_sentences in results:
+            for entry in chunk_sentences or []:
+                if entry["sentence"] not in seen:
+                    seen.add(entry["sentence"])
+                    sentences.append(entry)
+        return {"sentences": sentences}, all(result is not None for result in results)
         
-        **IMPORTANT**: Do not include citations within mathematical equations or environments. 
+    async def _analyze_chunk_async(self, text: str, semaphore: asyncio.Semaphore) -> Optional[List[Dict]]:
+        """Analyze one piece of a chapter for sentences requiring citations.
         
-        Respond with ONLY a valid JSON object in this exact format:
-        {
-            "sentences": [
-                {
-                    "sentence": "exact sentence from text",
-                    "reason": "brief reason for citation",
-                    "key_terms": ["term1", "term2"]
-                }
-            ]
-        }
+        Args:
+            text: Text content to analyze
+            semaphore: Bounds the number of AI requests in flight
+            
+        Returns:
+            List of validated citation entries, or None if the analysis fails
         """
-        
         try:
-            response = self.ai_api.generate_content(prompt + "\n\nText:\n" + text)
+            # Key the response cache on whitespace-normalized text so reflowed chapters still hit
+            normalized = _WHITESPACE_RE.sub(' ', text).strip()
+            async with semaphore:
+                response = await cached_generate_async(
+                    self.ai_api, _CITATION_ANALYSIS_PROMPT + text,
+                    cache_key=_CITATION_ANALYSIS_PROMPT + normalized,
+                    cache_if=lambda output: _extract_json_object(output) is not None)
 
             logger.debug(response)
             
-            # Clean the response - remove any non-JSON content
-            json_str = response.strip()
-            if not json_str.startswith('{'):
-                # Find the first { and last }
-                start = json_str.find('{')
-                end = json_str.rfind('}')
-                if start >= 0 and end >= 0:
-                    json_str = json_str[start:end+1]
-                else:
-                    raise ValueError("No JSON object found in response")
-                    
-            citation_data = json.loads(json_str)
+            # Parse the first complete JSON object, ignoring any prose around it
+            citation_data = _extract_json_object(response or "")
+            if citation_data is None:
+                raise ValueError("No JSON object found in response")
             
             # Validate the structure
-            if not isinstance(citation_data, dict) or "sentences" not in citation_data:
+            if not isinstance(citation_data, dict) or not isinstance(citation_data.get("sentences"), list):
                 raise ValueError("Invalid JSON structure")
                 
-            return citation_data
+            return _validate_sentence_entries(citation_data["sentences"])
             
         except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"Failed to parse AIAPI response: {e}")
-            return {"sentences": []}
+            logger.error("Failed to parse AIAPI response: %s", e)
+            return None
         except Exception as e:
-            logger.error(f"Error in citation analysis: {e}")
-            return {"sentences": []}
+            logger.error("Error in citation analysis: %s", e)
+            return None
     
-    def _process_single_chapter_task(self, chapter_file: str, debug_folder: str, citation_chapters: List[str]) -> tuple[str, Optional[Dict], List[Dict]]:
-        """Process a single chapter for citations (for concurrent execution).
+    def _load_citation_state(self, chapter_path: str) -> Tuple[str, Optional[Tuple[Dict, List]]]:
+        """Hash a chapter and load its stored citation state if still valid.
+        
+        The state is valid when the stored hash and version match and the cited
+        chapter from the previous run still exists.
         
         Args:
-            chapter_file: Name of the chapter file
-            debug_folder: Path to the debug folder
-            citation_chapters: List of chapters that need citations
+            chapter_path: Path to the chapter markdown file
+            
+        Returns:
+            Tuple of (chapter hash, (citation_data, sentence_pmids) or None)
+        """
+        data = Path(chapter_path).read_bytes()
+        self._chapter_text_cache[chapter_path] = data.decode("utf-8")
+        chapter_hash = hashlib.blake2b(data, digest_size=16).hexdigest()
+        
+        state_path = f"{chapter_path}.citations.json"
+        cited_path = chapter_path.replace('_chapter.md', '_chapter_cited.md')
+        if os.getenv('AI_CACHE_FORCE_REFRESH') == '1':
+            return chapter_hash, None
+        if not (os.path.exists(state_path) and os.path.exists(cited_path)):
+            return chapter_hash, None
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable citation state %s: %s", state_path, e)
+            return chapter_hash, None
+        
+        if state.get("version") != _CITATION_STATE_VERSION or state.get("hash") != chapter_hash:
+            return chapter_hash, None
+        return chapter_hash, (state["citation_data"], state["sentence_pmids"])
+    
+    def _save_citation_state(self, chapter_path: str, chapter_hash: str,
+                             citation_data: Dict, sentence_pmids: List) -> None:
+        """Store a chapter's citation analysis and search results next to it.
+        
+        Args:
+            chapter_path: Path to the chapter markdown file
+            chapter_hash: blake2b hash of the chapter contents
+            citation_data: Citation analysis data
+            sentence_pmids: (sentence, PubMed IDs) pairs for the chapter
+        """
+        state = {
+            "version": _CITATION_STATE_VERSION,
+            "hash": chapter_hash,
+            "citation_data": citation_data,
+            "sentence_pmids": sentence_pmids,
+        }
+        with open(f"{chapter_path}.citations.json", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+    
+    async def _analyze_chapters_async(self, chapter_paths: List[str], max_concurrency: int) -> List:
+        """Analyze several chapters for citations concurrently.
+        
+        Args:
+            chapter_paths: Paths to the chapter markdown files
+            max_concurrency: Maximum number of AI requests in flight across all chapters
             
         Returns:
-            Tuple of (chapter_file, citation_data, papers)
+            Citation analysis (or the raised exception) per chapter, in input order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        return await asyncio.gather(
+            *[self._analyze_chapter_async(path, semaphore) for path in chapter_paths],
+            return_exceptions=True
+        )
+    
+    def _copy_uncited_chapter(self, chapter_file: str, debug_folder: str) -> None:
+        """Create the _cited version of a chapter that does not need citations.
+        
+        Args:
+            chapter_file: Name of the chapter file
+            debug_folder: Path to the debug folder
         """
         chapter_path = os.path.join(debug_folder, chapter_file)
-        chapter_name = chapter_file.replace('_chapter.md', '')
-        
-        # Only process citations for specific chapters
-        if chapter_name in citation_chapters:
-            logger.info(f"Processing citations for {chapter_file}")
-            
-            # Analyze chapter for citations
-            citation_data = self._analyze_chapter(chapter_path)
-            if citation_data:
-                # Generate citations
-                papers = self._generate_citations(citation_data)
-                return chapter_file, citation_data, papers
-            else:
-                return chapter_file, None, []
-        else:
-            # For non-citation chapters, just create the _cited version without modifications
-            base_name = os.path.splitext(os.path.basename(chapter_path))[0]
-            output_path = os.path.join(debug_folder, f"{base_name}_cited.md")
-            with open(chapter_path, "r", encoding="utf-8") as f:
-                text = f.read()
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(text)
-            logger.info(f"Created cited version without citations for {chapter_file}")
-            return chapter_file, None, []
+        base_name = os.path.splitext(chapter_file)[0]
+        output_path = os.path.join(debug_folder, f"{base_name}_cited.md")
+        shutil.copyfile(chapter_path, output_path)
+        logger.info("Created cited version without citations for %s", chapter_file)
     
-    def _generate_citations_for_sentence(self, entry: Dict, max_results: int = 3) -> List[Dict]:
-        """Generate citations for a single sentence (for concurrent execution).
+    def _search_sentence(self, entry: Dict, max_results: int = 3) -> Optional[List[str]]:
+        """Search PubMed IDs for a single sentence.
         
         Args:
             entry: Citation entry containing sentence and key terms
             max_results: Maximum number of papers per sentence
             
         Returns:
-            List of paper details for this sentence
+            List of PubMed IDs for this sentence, or None if the search failed
         """
-        papers = []
-        
         if self.google_api_key and self.google_engine_id:
             query = " ".join(entry["key_terms"])
-            logger.info(f"Querying Google Custom Search for sentence: '{query}'")
+            logger.info("Querying Google Custom Search for sentence: '%s'", query)
             pmids = self._google_search_pubmed(query, max_results)
         else:
             query = " ".join(entry["key_terms"]) + " [Title/Abstract]"
-            logger.info(f"Querying PubMed for sentence: '{query}'")
+            logger.info("Querying PubMed for sentence: '%s'", query)
             pmids = self._search_pubmed(query, max_results)
 
+        if pmids is None:
+            return None
         if not pmids:
-            logger.warning(f"No results found for query: {query}")
-            return papers
+            logger.warning("No results found for query: %s", query)
             
-        for pmid in pmids:
-            paper = self._fetch_paper_details(pmid)
-            if paper:
-                paper["sentence"] = entry["sentence"]  # Store the sentence for mapping
-                papers.append(paper)
-                logger.info(f"Added paper: {paper['title']} ({paper['year']})")
-            time.sleep(0.5)  # Respect API rate limits
+        # Different result URLs can point at the same paper
+        return list(dict.fromkeys(pmids))
             
-        return papers
-            
-    def _generate_citations(self, citation_data: Dict, max_results: int = 3) -> List[Dict]:
-        """Generate citations for identified sentences.
+    def _search_citations(self, citation_data: Dict,
+                          max_results: int = 3) -> Tuple[List[Tuple[str, List[str]]], bool]:
+        """Search PubMed IDs for identified sentences.
         
         Args:
             citation_data: Citation analysis data
             max_results: Maximum number of papers per sentence
             
         Returns:
-            List of paper details for citations
+            Tuple of ((sentence, PubMed IDs) pairs, whether every search succeeded);
+            sentences whose search failed get no IDs
         """
-        papers = []
         sentences = citation_data.get("sentences", [])
         
-        if not sentences:
-            return papers
+        # Sentences with the same key terms (ignoring case and order) share one search
+        unique_entries = {}
+        for entry in sentences:
+            unique_entries.setdefault(_query_key(entry["key_terms"]), entry)
+        logger.info("Searching citations for %s sentences (%s unique queries)", len(sentences), len(unique_entries))
             
-        # For citation generation, we use sequential processing to respect PubMed API rate limits
-        # Concurrent requests to PubMed could cause rate limiting issues
-        for idx, entry in enumerate(sentences):
-            logger.info(f"Processing sentence {idx + 1} of {len(sentences)}")
-            sentence_papers = self._generate_citations_for_sentence(entry, max_results)
-            papers.extend(sentence_papers)
-                
-        return papers
-        
-    def _search_pubmed(self, query: str, max_results: int) -> List[str]:
+        # Searches run concurrently, bounded to stay within PubMed API rate limits
+        search = lambda entry: self._search_sentence(entry, max_results)
+        if self._search_executor:
+            results = self._search_executor.map(search, unique_entries.values())
+        else:
+            with ThreadPoolExecutor(max_workers=self._search_workers) as executor:
+                results = list(executor.map(search, unique_entries.values()))
+        pmids_by_query = dict(zip(unique_entries, results))
+        complete = all(pmids is not None for pmids in pmids_by_query.values())
+        return [(entry["sentence"], pmids_by_query[_query_key(entry["key_terms"])] or [])
+                for entry in sentences], complete
+            
+    def _search_pubmed(self, query: str, max_results: int) -> Optional[List[str]]:
         """Search PubMed for papers.
         
         Args:
@@ -306,18 +762,64 @@ class CitationGenerator:
             max_results: Maximum number of results
             
         Returns:
-            List of PubMed IDs
+            List of PubMed IDs, or None if the search failed
         """
+        cache_key = f"esearch:{query}:{max_results}"
+        if self._cache:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+            
         try:
-            handle = Entrez.esearch(db="pubmed", term=query, retmax=max_results, sort="relevance")
-            record = Entrez.read(handle)
-            handle.close()
-            return record["IdList"]
+            result = _json_loads(self._eutils("esearch.fcgi", {
+                "db": "pubmed", "term": query, "retmax": max_results, "sort": "relevance", "retmode": "json"
+            }))
+            pmids = result["esearchresult"]["idlist"]
+            if self._cache:
+                self._cache.set(cache_key, pmids)
+            return pmids
         except Exception as e:
-            logger.error(f"PubMed search error: {e}")
-            return []
+            logger.error("PubMed search error: %s", e)
+            return None
 
-    def _google_search_pubmed(self, query: str, max_results: int) -> List[str]:
+    def _eutils(self, endpoint: str, params: Dict, post: bool = False) -> bytes:
+        """Call an NCBI E-utilities endpoint.
+        
+        Args:
+            endpoint: Endpoint name, e.g. 'esearch.fcgi'
+            params: Query parameters; email and api_key are added automatically
+            post: Send the parameters as a POST body (for long ID lists)
+            
+        Returns:
+            Raw response body
+        """
+        params = dict(params)
+        if self.email:
+            params["email"] = self.email
+        if self.ncbi_api_key:
+            params["api_key"] = self.ncbi_api_key
+        query_string = urllib.parse.urlencode(params)
+        
+        if post:
+            url, data = _EUTILS_URL + endpoint, query_string.encode("ascii")
+        else:
+            url, data = f"{_EUTILS_URL}{endpoint}?{query_string}", None
+            
+        def _throttled_request() -> bytes:
+            # Retries go through the limiter too
+            self._eutils_limiter.acquire()
+            return _http_request(url, data)
+            
+        def _before_retry(retry_state) -> None:
+            _log_retry(retry_state)
+            exc = retry_state.outcome.exception()
+            if isinstance(exc, urllib.error.HTTPError) and exc.code == 429:
+                # Throttled: every worker waits, not just the one that got the 429
+                self._eutils_limiter.pause(retry_state.next_action.sleep)
+                
+        return Retrying(before_sleep=_before_retry, **_RETRY_POLICY)(_throttled_request)
+        
+    def _google_search_pubmed(self, query: str, max_results: int) -> Optional[List[str]]:
         """Search PubMed using Google Custom Search API.
         
         Args:
@@ -325,12 +827,11 @@ class CitationGenerator:
             max_results: Maximum number of results
             
         Returns:
-            List of PubMed IDs
+            List of PubMed IDs, or None if the search failed
         """
         # Construct PubMed-specific query
         pubmed_query = f"{query} site:pubmed.ncbi.nlm.nih.gov"
         
-        url = "https://www.googleapis.com/customsearch/v1"
         params = {
             "key": self.google_api_key,
             "cx": self.google_engine_id,
@@ -339,13 +840,10 @@ class CitationGenerator:
         }
         
         try:
-            # Build URL with query parameters
+            # Build URL with query parameters and make the request
             query_string = urllib.parse.urlencode(params)
-            full_url = f"{url}?{query_string}"
-            
-            # Make the request
-            with urllib.request.urlopen(full_url) as response:
-                data = json.loads(response.read().decode('utf-8'))
+            body = Retrying(before_sleep=_log_retry, **_RETRY_POLICY)(_http_request, f"{_GOOGLE_CSE_URL}?{query_string}")
+            data = _json_loads(body)
             
             pmids = []
             if "items" in data:
@@ -360,11 +858,11 @@ class CitationGenerator:
             return pmids
             
         except (urllib.error.URLError, urllib.error.HTTPError) as e:
-            logger.error(f"Google search request failed: {e}")
-            return []
+            logger.error("Google search request failed: %s", e)
+            return None
         except Exception as e:
-            logger.error(f"Google search error: {e}")
-            return []
+            logger.error("Google search error: %s", e)
+            return None
     
     def _extract_pmid_from_url(self, url: str) -> Optional[str]:
         """Extract PubMed ID from a PubMed URL.
@@ -375,103 +873,137 @@ class CitationGenerator:
         Returns:
             PubMed ID if found, None otherwise
         """
-        import re
-        
-        # Common PubMed URL patterns
-        patterns = [
-            r'pubmed\.ncbi\.nlm\.nih\.gov/(\d+)',  # /12345678
-            r'pubmed\.ncbi\.nlm\.nih\.gov/\?term=(\d+)',  # ?term=12345678
-            r'pubmed\.ncbi\.nlm\.nih\.gov/\?linkname=pubmed_pubmed&from_uid=(\d+)',  # from_uid=12345678
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
+        for pattern in _PUBMED_URL_PATTERNS:
+            match = pattern.search(url)
             if match:
                 return match.group(1)
         
         return None
             
-    def _fetch_paper_details(self, pmid: str) -> Optional[Dict]:
-        """Fetch paper metadata from PubMed.
+    def _fetch_papers_batch(self, pmids: List[str], batch_size: int = 200) -> Dict[str, Dict]:
+        """Fetch paper metadata for many PubMed IDs with batched efetch calls.
         
         Args:
-            pmid: PubMed ID
+            pmids: PubMed IDs to fetch (duplicates are fetched once)
+            batch_size: Maximum number of IDs per efetch request
             
         Returns:
-            Dictionary containing paper details or None if fetch fails
+            Dictionary mapping PubMed ID to paper details
         """
-        try:
-            from Bio import Medline
-            handle = Entrez.efetch(db="pubmed", id=pmid, rettype="medline", retmode="text")
-            records = list(Medline.parse(handle))
-            handle.close()
-            
-            if not records:
-                logger.warning(f"No records found for PMID {pmid}")
-                return None
+        unique_pmids = list(dict.fromkeys(pmids))
+        papers = {}
+        if self._cache:
+            for pmid in unique_pmids:
+                cached = self._cache.get(f"efetch:{pmid}")
+                if cached is not None:
+                    papers[pmid] = cached
+                    
+        to_fetch = [pmid for pmid in unique_pmids if pmid not in papers]
+        if not to_fetch:
+            return papers
+            
+        # Large sets are posted once to the NCBI history server and paged from there
+        history = None
+        if len(to_fetch) > batch_size:
+            try:
+                result = ET.fromstring(self._eutils("epost.fcgi", {"db": "pubmed", "id": ",".join(to_fetch)}, post=True))
+                history = {"WebEnv": result.findtext("WebEnv"), "query_key": result.findtext("QueryKey")}
+                if not all(history.values()):
+                    raise ValueError("EPost response has no WebEnv/QueryKey")
+            except Exception as e:
+                logger.warning("EPost failed, fetching PMIDs by ID list instead: %s", e)
                 
-            record = records[0]  # Get the first record
+        for start in range(0, len(to_fetch), batch_size):
+            batch = to_fetch[start:start + batch_size]
+            try:
+                if history:
+                    params = {"db": "pubmed", "retmode": "xml", "retstart": start, "retmax": batch_size, **history}
+                else:
+                    params = {"db": "pubmed", "retmode": "xml", "id": ",".join(batch)}
+                root = ET.fromstring(self._eutils("efetch.fcgi", params, post=True))
+            except Exception as e:
+                logger.error("Error fetching PMIDs %s..%s: %s", batch[0], batch[-1], e)
+                continue
+                
+            for article in root.iter("PubmedArticle"):
+                paper = self._parse_pubmed_article(article)
+                if paper:
+                    papers[paper["pmid"]] = paper
+                    if self._cache:
+                        self._cache.set(f"efetch:{paper['pmid']}", paper)
+        
+        missing = [pmid for pmid in unique_pmids if pmid not in papers]
+        if missing:
+            logger.warning("No records found for PMIDs: %s", ', '.join(missing))
+        return papers
+            
+    def _parse_pubmed_article(self, article: ET.Element) -> Optional[Dict]:
+        """Convert a PubmedArticle XML element into paper metadata.
+        
+        Args:
+            article: <PubmedArticle> element from an efetch XML response
+            
+        Returns:
+            Dictionary containing paper details or None if parsing fails
+        """
+        pmid = article.findtext("MedlineCitation/PMID")
+        if not pmid:
+            return None
+            
+        try:
+            citation = article.find("MedlineCitation")
+            journal_issue = citation.find("Article/Journal/JournalIssue")
             
             # Extract authors in "LastName, Initials" format
             authors = []
-            if "AU" in record:
-                for author in record.get("AU", []):
-                    # Authors in Medline format are already "LastName Initials"
-                    # Convert to "LastName, Initials" format
-                    parts = author.split()
-                    if len(parts) > 1:
-                        lastname = parts[0]
-                        initials = " ".join(parts[1:])
-                        authors.append(f"{lastname}, {initials}")
-                    else:
-                        authors.append(author)
+            for author in citation.iterfind("Article/AuthorList/Author"):
+                lastname = author.findtext("LastName")
+                initials = author.findtext("Initials")
+                if lastname and initials:
+                    authors.append(f"{lastname}, {initials}")
+                else:
+                    name = lastname or author.findtext("CollectiveName")
+                    if name:
+                        authors.append(name)
             
-            # Get publication year from the date
+            # Get publication year; MedlineDate is free text such as "2019 Jan-Feb"
             year = "Unknown"
-            if "DP" in record:
-                # Date format is typically "YYYY Mon DD" or "YYYY"
-                date_parts = record.get("DP", "").split()
-                if date_parts and date_parts[0].isdigit():
-                    year = date_parts[0]
+            if journal_issue is not None:
+                date_text = (journal_issue.findtext("PubDate/Year")
+                             or journal_issue.findtext("PubDate/MedlineDate") or "")
+                if date_text[:4].isdigit():
+                    year = date_text[:4]
             
             # Get DOI if available
-            doi = "Not available"
-            if "LID" in record:
-                lid = record.get("LID", "")
-                if "[doi]" in lid:
-                    doi = lid.split(" [doi]")[0]
-            elif "AID" in record:
-                for aid in record.get("AID", []):
-                    if "[doi]" in aid:
-                        doi = aid.split(" [doi]")[0]
-                        break
-            
-            # Get volume and number if available
-            volume = None
-            number = None
-            if "VI" in record:
-                volume = record.get("VI", "").strip()
-            if "IP" in record:
-                number = record.get("IP", "").strip()
+            doi = article.findtext("PubmedData/ArticleIdList/ArticleId[@IdType='doi']")
+            if not doi:
+                doi = citation.findtext("Article/ELocationID[@EIdType='doi']")
+            
+            # Titles may contain inline markup such as <i>; keep only the text
+            title_elem = citation.find("Article/ArticleTitle")
+            title = "".join(title_elem.itertext()).strip() if title_elem is not None else ""
             
             paper_data = {
                 "pmid": pmid,
-                "title": record.get("TI", "No title"),
+                "title": title or "No title",
                 "authors": authors,
-                "journal": record.get("TA", "Unknown Journal"),
+                "journal": citation.findtext("MedlineJournalInfo/MedlineTA") or "Unknown Journal",
                 "year": year,
-                "doi": doi
+                "doi": doi.strip() if doi else "Not available"
             }
             
             # Only add volume and number if they exist and are not empty
-            if volume:
-                paper_data["volume"] = volume
-            if number:
-                paper_data["number"] = number
+            if journal_issue is not None:
+                volume = (journal_issue.findtext("Volume") or "").strip()
+                number = (journal_issue.findtext("Issue") or "").strip()
+                if volume:
+                    paper_data["volume"] = volume
+                if number:
+                    paper_data["number"] = number
                 
             return paper_data
         except Exception as e:
-            logger.error(f"Error fetching PMID {pmid}: {e}")
+            logger.error("Error parsing PMID %s: %s", pmid, e)
             return None
             
     def _export_bibtex(self, papers: List[Dict], output_file: str) -> Dict[str, List[str]]:
@@ -487,32 +1019,43 @@ class CitationGenerator:
         bibtex_entries = []
         citation_keys = {}
         used_keys = set()  # Track used keys to prevent duplicates
+        key_by_pmid = {}  # A paper cited by several sentences gets a single entry
         
         for paper in papers:
-            key = self._generate_bibtex_key(paper)
-            
-            # Ensure key is unique
-            base_key = key
-            counter = 1
-            while key in used_keys:
-                key = f"{base_key}{counter}"
-                counter += 1
-            
-            used_keys.add(key)
-            
-            entry = self._format_bibtex_entry(key, paper)
-            bibtex_entries.append(entry)
+            key = key_by_pmid.get(paper["pmid"])
+            if key is None:
+                key = self._generate_bibtex_key(paper)
+                
+                # Ensure key is unique
+                base_key = key
+                counter = 1
+                while key in used_keys:
+                    key = f"{base_key}{counter}"
+                    counter += 1
+                
+                used_keys.add(key)
+                key_by_pmid[paper["pmid"]] = key
+                
+                entry = self._format_bibtex_entry(key, paper)
+                bibtex_entries.append(entry)
             
             # Map the sentence to a list of citation keys
             if "sentence" in paper:
                 if paper["sentence"] not in citation_keys:
                     citation_keys[paper["sentence"]] = []
-                citation_keys[paper["sentence"]].append(key)
+                if key not in citation_keys[paper["sentence"]]:
+                    citation_keys[paper["sentence"]].append(key)
         
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write("\n\n".join(bibtex_entries))
-            
-        logger.info(f"BibTeX entries saved to {output_file}")
+        content = "\n\n".join(bibtex_entries).encode("utf-8")
+        output_path = Path(output_file)
+        if output_path.is_file() and output_path.read_bytes() == content:
+            logger.info("BibTeX entries unchanged in %s", output_file)
+        else:
+            # Write to a temporary file first so readers never see a partial bibliography
+            tmp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, output_path)
+            logger.info("BibTeX entries saved to %s", output_file)
         return citation_keys
             
     def _generate_bibtex_key(self, paper: Dict) -> str:
@@ -529,16 +1072,14 @@ class CitationGenerator:
             first_author = paper["authors"][0].split(",")[0].lower()
             
             # Normalize to ASCII - replace accented characters with ASCII equivalents
-            import unicodedata
-            first_author = unicodedata.normalize('NFKD', first_author)
-            first_author = ''.join([c for c in first_author if not unicodedata.combining(c)])
+            first_author = unicodedata.normalize('NFKD', first_author).encode('ascii', 'ignore').decode('ascii')
             
             key = f"{first_author}{paper['year']}"
         else:
             key = f"pmid{paper['pmid']}{paper['year']}"
             
         # Ensure key only contains valid characters
-        return re.sub(r'[^a-z0-9]', '', key)
+        return _BIBKEY_SANITIZE.sub('', key)
         
     def _format_bibtex_entry(self, key: str, paper: Dict) -> str:
         """Format paper details as BibTeX entry.
@@ -558,28 +1099,11 @@ class CitationGenerator:
             author_str = " and ".join(authors) or "Unknown Author"
         
         # Remove HTML/XML tags from title
-        title = re.sub(r'<[^>]+>', '', paper['title'])
-        
-        # Escape special characters in title and journal (backslash must be first!)
-        title = (title.replace("\\", "\\textbackslash")
-                     .replace("&", "\\&")
-                     .replace("%", "\\%")
-                     .replace("$", "\\$")
-                     .replace("#", "\\#")
-                     .replace("_", "\\_")
-                     .replace("{", "\\{")
-                     .replace("}", "\\}")
-                     .replace("~", "\\textasciitilde")
-                     .replace("^", "\\textasciicircum"))
-        
-        journal = (paper['journal'].replace("\\", "\\textbackslash")
-                                   .replace("&", "\\&")
-                                   .replace("%", "\\%")
-                                   .replace("$", "\\$")
-                                   .replace("#", "\\#")
-                                   .replace("_", "\\_")
-                                   .replace("{", "\\{")
-                                   .replace("}", "\\}"))
+        title = _HTML_TAG_RE.sub('', paper['title'])
+        
+        # Escape special characters in title and journal in a single pass
+        title = title.translate(_BIBTEX_TITLE_ESCAPES)
+        journal = paper['journal'].translate(_BIBTEX_JOURNAL_ESCAPES)
         
         doi_field = f"  doi = {{{paper['doi']}}},\n" if paper['doi'] != "Not available" else ""
         volume_field = f"  volume = {{{paper['volume']}}},\n" if 'volume' in paper else ""
@@ -597,7 +1121,8 @@ class CitationGenerator:
                 f"}}")
                 
     def _update_chapter_citations(self, chapter_path: str, citation_data: Dict, 
-                                bibtex_keys: Dict[str, List[str]], debug_folder: str) -> None:
+                                bibtex_keys: Dict[str, List[str]], debug_folder: str,
+                                chapter_text: Optional[str] = None) -> None:
         """Update chapter markdown with citation references.
         
         Args:
@@ -605,54 +1130,37 @@ class CitationGenerator:
             citation_data: Citation analysis data
             bibtex_keys: Mapping of sentences to lists of citation keys
             debug_folder: Path to debug folder
+            chapter_text: Chapter contents if already loaded; read from chapter_path otherwise
         """
         try:
-            with open(chapter_path, "r", encoding="utf-8") as f:
-                text = f.read()
+            text = chapter_text
+            if text is None:
+                text = Path(chapter_path).read_bytes().decode("utf-8")
                 
-            updated_text = text
+            # Map each cited sentence to its replacement text
+            replacements = {}
             for entry in citation_data.get("sentences", []):
                 sentence = entry["sentence"].strip()
-                if sentence in bibtex_keys:
+                if sentence and sentence in bibtex_keys and sentence not in replacements:
                     # Join multiple citation keys with semicolons
                     citations = "; ".join([f"@{key}" for key in bibtex_keys[sentence]])
                     citation = f"[{citations}]"
                     
-                    # Check if sentence ends with punctuation (period, comma, or semicolon)
-                    punctuation_marks = ['.', ',', ';']
-                    ending_punctuation = None
-                    
-                    for punct in punctuation_marks:
-                        if sentence.endswith(punct):
-                            ending_punctuation = punct
-                            break
-                    
-                    if ending_punctuation:
+                    if sentence[-1] in _PUNCT:
                         # Insert citation before the punctuation with non-breaking space
-                        sentence_without_punct = sentence[:-1]
-                        escaped_punct = re.escape(ending_punctuation)
-                        updated_text = re.sub(
-                            f"{re.escape(sentence_without_punct)}{escaped_punct}(?!\\s*\\[@)",
-                            f"{sentence_without_punct}&nbsp;{citation}{ending_punctuation}",
-                            updated_text,
-                            count=1
-                        )
+                        replacements[sentence] = f"{sentence[:-1]}&nbsp;{citation}{sentence[-1]}"
                     else:
                         # For sentences without punctuation, add citation at the end with non-breaking space
-                        updated_text = re.sub(
-                            f"{re.escape(sentence)}(?!\\s*\\[@)",
-                            f"{sentence}&nbsp;{citation}",
-                            updated_text,
-                            count=1
-                        )
+                        replacements[sentence] = f"{sentence}&nbsp;{citation}"
+            
+            updated_text = _insert_citations(text, replacements) if replacements else text
                     
             # Save with consistent naming that matches thesis_compiler.py expectations
             chapter_name = os.path.basename(chapter_path).replace('_chapter.md', '')
             output_path = os.path.join(debug_folder, f"{chapter_name}_chapter_cited.md")
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(updated_text)
+            Path(output_path).write_bytes(updated_text.encode("utf-8"))
                 
-            logger.info(f"Updated chapter saved to {output_path}")
+            logger.info("Updated chapter saved to %s", output_path)
             
         except Exception as e:
-            logger.error(f"Error updating chapter citations for {chapter_path}: {e}")
\ No newline at end of file
+            logger.error("Error updating chapter citations for %s: %s", chapter_path, e)
\ No newline at end of file
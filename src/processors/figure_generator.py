@@ -1,34 +1,80 @@
 import json
 import os
+import asyncio
 import re
+import bisect
 import logging
-import glob
-from typing import Dict, List, Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+# google-genai's pydantic schema conversion rejects typing.TypedDict before Python 3.12
+from typing_extensions import TypedDict
 from PIL import Image
 from ..ai.ai_api_interface import AIAPIInterface
+from ..ai._cache import cached_generate_async
+
+try:
+    # Optional faster parser; its JSONDecodeError subclasses json.JSONDecodeError
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Page images are named page_NUMBER.jpg (cropped copies get a _cropped suffix)
+_PAGE_IMAGE_RE = re.compile(r'^page_(\d+)\.jpg$')
+# "*Page N*:" markers in extracted_text.txt
+_EXTRACTED_PAGE_RE = re.compile(r'\*Page (\d+)\*:')
+# "Page N:" markers in <chapter>_section.txt
+_SECTION_PAGE_RE = re.compile(r'Page (\d+):')
+# Blank-line paragraph separators in chapter markdown
+_PARA_SPLIT_RE = re.compile(r'\n\s*\n')
+# Maximum characters of extracted page text included per figure in the prompt
+_FIGURE_CONTEXT_CHARS = 500
+# Repairs for malformed model JSON: "[1, 2,]" / "{...} {...}"
+_TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+_MISSING_OBJECT_COMMA_RE = re.compile(r'}\s*{')
+# Characters not allowed in pandoc-crossref figure IDs
+_ID_UNSAFE_RE = re.compile(r'[^a-z0-9]')
+
+def _has_figure_references(response: str) -> bool:
+    """Cache predicate: only keep responses that carry a figure_references payload."""
+    return '"figure_references"' in response
+
+class FigureRef(TypedDict):
+    """One sentence that should cite a figure, as returned by the model."""
+    sentence: str
+    figure_filename: str
+    figure_legend: str
+
+class FigureRefs(TypedDict):
+    """Response schema for figure analysis."""
+    figure_references: List[FigureRef]
+
 class FigureGenerator:
     """Identifies sentences that should reference figures and adds appropriate figure references."""
     
-    def __init__(self, ai_api: AIAPIInterface, crop_top_pixels: int = 0):
+    def __init__(self, ai_api: AIAPIInterface, crop_top_pixels: int = 0, max_workers: Optional[int] = None,
+                 use_batch: bool = False):
         """Initialize the FigureGenerator.
         
         Args:
             ai_api: Instance of AIAPIInterface for figure analysis
             crop_top_pixels: Number of pixels to crop from top of images (default: 0, no cropping)
+            max_workers: Upper bound on concurrent chapter analyses (default: the
+                ``threads`` value passed to process_chapters)
+            use_batch: Submit all chapter analyses as one provider batch job instead of
+                individual requests (cheaper, but completes asynchronously)
         """
         self.ai_api = ai_api
         self.crop_top_pixels = crop_top_pixels
+        self.max_workers = max_workers
+        self.use_batch = use_batch
         # Add a class-level dictionary to track figure IDs across all chapters
         self.global_figure_ids = {}
+        # Figure IDs already handed out, for O(1) uniqueness checks
+        self._used_ids: Set[str] = set()
+        # Directory listing of the debug folder (name -> path), taken once per run
+        self._dir_index: Dict[str, str] = {}
         
     def process_chapters(self, debug_folder: str, threads: int = 1) -> bool:
         """Process markdown files to add figure references.
@@ -43,15 +89,19 @@ class FigureGenerator:
         try:
             # Reset global figure IDs for a new processing run
             self.global_figure_ids = {}
+            self._used_ids = set()
+            
+            # List the debug folder once; helpers check for files against this index
+            self._dir_index = {entry.name: entry.path for entry in os.scandir(debug_folder)}
             
             # Find all cited chapter markdown files for methods and results
             target_chapters = ['introduction', 'methods', 'results', 'appendix']
             chapter_files = []
             
             for chapter in target_chapters:
-                chapter_file = os.path.join(debug_folder, f"{chapter}_chapter_cited.md")
-                if os.path.exists(chapter_file):
-                    chapter_files.append(chapter_file)
+                chapter_filename = f"{chapter}_chapter_cited.md"
+                if chapter_filename in self._dir_index:
+                    chapter_files.append(os.path.join(debug_folder, chapter_filename))
             
             if not chapter_files:
                 logger.error(f"No target chapter files found in {debug_folder}")
@@ -65,32 +115,32 @@ class FigureGenerator:
             
             # Get extracted text for context
             extracted_text = self._load_extracted_text(debug_folder)
-            
-            # Process chapters
-            if threads <= 1:
-                # Sequential processing (original behavior)
-                logger.info("Processing chapters sequentially for figure references...")
-                for chapter_file in chapter_files:
-                    self._process_single_chapter_for_figures(chapter_file, figure_images, extracted_text, debug_folder)
+            # Only pages with an image can be referenced, so describe only those
+            extracted_text = {name: text for name, text in extracted_text.items() if name in figure_images}
+            
+            # Analysis is network-bound, so chapters are analysed concurrently on one
+            # event loop; updates run serially afterwards so global_figure_ids needs no lock.
+            workers = max(1, min(self.max_workers or threads, len(chapter_files)))
+            if self.use_batch:
+                logger.info(f"Submitting {len(chapter_files)} chapters as one batch for figure references...")
+                analyses = self._analyze_chapters_batch(chapter_files, extracted_text, debug_folder)
             else:
-                # Concurrent processing
-                logger.info(f"Processing chapters concurrently for figure references using {threads} threads...")
-                with ThreadPoolExecutor(max_workers=threads) as executor:
-                    # Submit all chapter processing tasks
-                    future_to_chapter = {
-                        executor.submit(self._process_single_chapter_for_figures, chapter_file, figure_images, extracted_text, debug_folder): chapter_file
-                        for chapter_file in chapter_files
-                    }
-                    
-                    # Collect results as they complete
-                    for future in as_completed(future_to_chapter):
-                        chapter_file = future_to_chapter[future]
-                        try:
-                            success = future.result()
-                            if success:
-                                logger.info(f"Completed figure processing for {os.path.basename(chapter_file)}")
-                        except Exception as e:
-                            logger.error(f"Error processing figures for {chapter_file}: {str(e)}")
+                logger.info(f"Analyzing chapters for figure references with up to {workers} concurrent requests...")
+                analyses = asyncio.run(self._analyze_chapters_async(chapter_files, extracted_text, debug_folder, workers))
+            
+            # Apply in chapter order so figure IDs are deterministic across runs
+            failed_chapters = []
+            for chapter_file in chapter_files:
+                figure_data = analyses.get(chapter_file)
+                if figure_data is None:
+                    failed_chapters.append(os.path.basename(chapter_file))
+                    continue
+                if self._apply_figure_data(chapter_file, figure_data, debug_folder):
+                    logger.info(f"Completed figure processing for {os.path.basename(chapter_file)}")
+            
+            if failed_chapters:
+                logger.error(f"Figure analysis failed for: {', '.join(failed_chapters)}")
+                return False
             
             logger.info("Successfully processed all chapters for figure references")
             return True
@@ -109,16 +159,12 @@ class FigureGenerator:
             Dictionary mapping original image filenames to their paths (cropped or original)
         """
         figure_images = {}
-        image_pattern = os.path.join(debug_folder, "page_*.jpg")
         
-        # Regex to match only page_NUMBER.jpg (not page_NUMBER_cropped.jpg)
-        page_pattern = re.compile(r'^page_\d+\.jpg$')
-        
-        for image_path in glob.glob(image_pattern):
-            image_name = os.path.basename(image_path)  # e.g., "page_1.jpg"
-            
-            # Only process files that match page_NUMBER.jpg pattern
-            if not page_pattern.match(image_name):
+        for image_name, image_path in self._dir_index.items():
+            # Only process files that match page_NUMBER.jpg pattern (e.g. "page_1.jpg");
+            # the cheap prefix/suffix tests skip most other files before the regex
+            if not (image_name.startswith("page_") and image_name.endswith(".jpg")
+                    and _PAGE_IMAGE_RE.match(image_name)):
                 continue
             
             if self.crop_top_pixels > 0:
@@ -200,18 +246,24 @@ class FigureGenerator:
         extracted_text = {}
         extracted_text_file = os.path.join(debug_folder, "extracted_text.txt")
         
-        if os.path.exists(extracted_text_file):
+        if "extracted_text.txt" in self._dir_index:
             try:
-                with open(extracted_text_file, "r", encoding="utf-8") as f:
-                    content = f.read()
+                # Stream the file line by line, collecting text between "*Page N*:" markers
+                current_page, current_text = None, []
                 
-                # Parse the content to extract page text
-                page_pattern = r'\*Page (\d+)\*:\n(.*?)(?=\*Page \d+\*:|$)'
-                matches = re.findall(page_pattern, content, re.DOTALL)
+                with open(extracted_text_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        page_match = _EXTRACTED_PAGE_RE.match(line)
+                        if page_match:
+                            if current_page:
+                                extracted_text[current_page] = ''.join(current_text).strip()
+                            current_page = f"page_{page_match.group(1)}.jpg"
+                            current_text = [line[page_match.end():]]
+                        elif current_page:
+                            current_text.append(line)
                 
-                for page_num, text in matches:
-                    image_name = f"page_{page_num}.jpg"
-                    extracted_text[image_name] = text.strip()
+                if current_page:
+                    extracted_text[current_page] = ''.join(current_text).strip()
                     
                 return extracted_text
             except Exception as e:
@@ -219,56 +271,96 @@ class FigureGenerator:
                 
         return {}
     
-    def _analyze_chapter_for_figures(self, chapter_path: str, figure_images: Dict[str, str], 
-                                    extracted_text: Dict[str, str], debug_folder: str) -> Optional[Dict]:
-        """Analyze a chapter file for sentences that should reference figures.
+    async def _analyze_chapter_for_figures_async(self, chapter_path: str, extracted_text: Dict[str, str],
+                                                 debug_folder: str) -> Optional[Dict]:
+        """Analyze a chapter file for figure references without blocking the event loop.
         
         Args:
             chapter_path: Path to the chapter markdown file
-            figure_images: Dictionary of available figure images
             extracted_text: Dictionary of extracted text for each figure
             debug_folder: Path to the debug folder
             
         Returns:
             Dictionary containing figure analysis or None if analysis fails
         """
-        if not os.path.exists(chapter_path):
+        if os.path.basename(chapter_path) not in self._dir_index:
             logger.error(f"Chapter file not found: {chapter_path}")
             return None
             
         try:
             with open(chapter_path, "r", encoding="utf-8") as f:
                 chapter_text = f.read()
+            chapter_name = os.path.basename(chapter_path).split('_')[0]
             
-            # Extract chapter name from file path (e.g., "introduction_chapter_cited.md" -> "introduction")
-            chapter_filename = os.path.basename(chapter_path)
-            chapter_name = chapter_filename.split('_')[0]  # Get the first part before underscore
-                
-            figure_data = self._analyze_figures(chapter_text, figure_images, extracted_text, chapter_name, debug_folder)
+            prompt = self._build_figure_prompt(chapter_text, extracted_text, chapter_name, debug_folder)
+            response = await cached_generate_async(self.ai_api, prompt, cache_if=_has_figure_references,
+                                                   response_schema=FigureRefs)
             logger.info(f"Analyzed figure references for {os.path.basename(chapter_path)}")
-            return figure_data
+            return self._parse_figure_response(response)
             
         except Exception as e:
             logger.error(f"Error analyzing chapter {chapter_path} for figures: {e}")
             return None
     
-    def _process_single_chapter_for_figures(self, chapter_file: str, figure_images: Dict[str, str], extracted_text: Dict[str, str], debug_folder: str) -> bool:
-        """Process a single chapter for figure references (for concurrent execution).
+    async def _analyze_chapters_async(self, chapter_files: List[str], extracted_text: Dict[str, str],
+                                      debug_folder: str, max_concurrency: int) -> Dict[str, Optional[Dict]]:
+        """Analyze several chapters for figure references concurrently.
         
         Args:
-            chapter_file: Path to the chapter file
-            figure_images: Dictionary of available figure images
+            chapter_files: Paths to the chapter markdown files
             extracted_text: Dictionary of extracted text for each figure
+            debug_folder: Path to the debug folder
+            max_concurrency: Maximum number of analyses in flight at once
+            
+        Returns:
+            Dictionary mapping each chapter path to its figure analysis (or None)
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def analyze(chapter_file: str) -> Optional[Dict]:
+            async with semaphore:
+                return await self._analyze_chapter_for_figures_async(chapter_file, extracted_text, debug_folder)
+        
+        results = await asyncio.gather(*[analyze(chapter_file) for chapter_file in chapter_files])
+        return dict(zip(chapter_files, results))
+    
+    def _analyze_chapters_batch(self, chapter_files: List[str], extracted_text: Dict[str, str],
+                                debug_folder: str) -> Dict[str, Optional[Dict]]:
+        """Analyze all chapters for figures with a single batch submission.
+        
+        Args:
+            chapter_files: Paths to the chapter markdown files
+            extracted_text: Dictionary of extracted text for each figure
+            debug_folder: Path to the debug folder
+            
+        Returns:
+            Dictionary mapping each chapter path to its figure analysis (or None)
+        """
+        prompts = []
+        for chapter_file in chapter_files:
+            with open(chapter_file, "r", encoding="utf-8") as f:
+                chapter_text = f.read()
+            chapter_name = os.path.basename(chapter_file).split('_')[0]
+            prompts.append(self._build_figure_prompt(chapter_text, extracted_text, chapter_name, debug_folder))
+        
+        responses = self.ai_api.submit_batch(prompts, response_schema=FigureRefs)
+        return {
+            chapter_file: self._parse_figure_response(response) if response else None
+            for chapter_file, response in zip(chapter_files, responses)
+        }
+    
+    def _apply_figure_data(self, chapter_file: str, figure_data: Optional[Dict], debug_folder: str) -> bool:
+        """Write figure references from a finished analysis into the chapter.
+        
+        Args:
+            chapter_file: Path to the chapter file
+            figure_data: Result of the chapter's figure analysis (may be None)
             debug_folder: Path to debug folder
             
         Returns:
-            bool: True if processing was successful, False otherwise
+            bool: True if references were written, False otherwise
         """
         try:
-            logger.info(f"Processing figures for {os.path.basename(chapter_file)}")
-            
-            # Analyze chapter for figure references
-            figure_data = self._analyze_chapter_for_figures(chapter_file, figure_images, extracted_text, debug_folder)
             if figure_data:
                 # Update figure filenames to use cropped versions when cropping is enabled
                 if self.crop_top_pixels > 0:
@@ -279,7 +371,8 @@ class FigureGenerator:
                             entry["figure_filename"] = cropped_filename
                 
                 # Update chapter with figure references
-                logger.debug(f"Figure data: {figure_data}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Figure data: {figure_data}")
                 self._update_chapter_figures(chapter_file, figure_data, debug_folder)
                 logger.info(f"Added figure references to {os.path.basename(chapter_file)}")
                 return True
@@ -304,7 +397,7 @@ class FigureGenerator:
         page_numbers = []
         section_file = os.path.join(debug_folder, f"{chapter_name}_section.txt")
         
-        if not os.path.exists(section_file):
+        if f"{chapter_name}_section.txt" not in self._dir_index:
             logger.warning(f"Section file not found: {section_file}")
             return page_numbers
             
@@ -313,8 +406,7 @@ class FigureGenerator:
                 content = f.read()
             
             # Extract page numbers from lines like "Page 1:", "Page 2:", etc.
-            page_pattern = r'Page (\d+):'
-            matches = re.findall(page_pattern, content)
+            matches = _SECTION_PAGE_RE.findall(content)
             page_numbers = list(set(matches))  # Remove duplicates
             
             logger.debug(f"Found {len(page_numbers)} pages for {chapter_name} chapter: {page_numbers}")
@@ -324,19 +416,18 @@ class FigureGenerator:
             logger.error(f"Error reading section file {section_file}: {e}")
             return page_numbers
 
-    def _analyze_figures(self, text: str, figure_images: Dict[str, str], 
-                        extracted_text: Dict[str, str], chapter_name: str, debug_folder: str) -> Dict:
-        """Analyze text for sentences that should reference figures using AI.
+    def _build_figure_prompt(self, text: str, extracted_text: Dict[str, str],
+                             chapter_name: str, debug_folder: str) -> str:
+        """Build the figure-analysis prompt for one chapter.
         
         Args:
-            text: Text content to analyze
-            figure_images: Dictionary of available figure images
+            text: Chapter text to analyze
             extracted_text: Dictionary of extracted text for each figure
-            chapter_name: Name of the current chapter being processed
+            chapter_name: Name of the chapter being processed
             debug_folder: Path to the debug folder
             
         Returns:
-            Dictionary containing figure analysis
+            Prompt string including the figure context and chapter text
         """
         # Get page numbers for this chapter from the section file
         chapter_page_numbers = self._get_chapter_page_numbers(debug_folder, chapter_name)
@@ -351,7 +442,7 @@ class FigureGenerator:
             chapter_specific_text = {}
             for image_name, image_text in extracted_text.items():
                 # Extract page number from image name (e.g., "page_5.jpg" -> "5")
-                page_match = re.search(r'page_(\d+)\.jpg', image_name)
+                page_match = _PAGE_IMAGE_RE.match(image_name)
                 if page_match:
                     page_num = page_match.group(1)
                     if page_num in chapter_page_numbers:
@@ -359,10 +450,12 @@ class FigureGenerator:
             
             logger.info(f"Filtered to {len(chapter_specific_text)} figures for {chapter_name} chapter (from {len(extracted_text)} total)")
         
-        # Prepare context about available figures (now chapter-specific)
-        figure_context = ""
-        for image_name, image_text in chapter_specific_text.items():
-            figure_context += f"Figure {image_name}:\n{image_text}\n\n"
+        # Prepare context about available figures (now chapter-specific). Each page is
+        # truncated: the opening text identifies a slide, and prompt size drives latency.
+        figure_context = "".join(
+            f"Figure {image_name}:\n{image_text[:_FIGURE_CONTEXT_CHARS]}\n\n"
+            for image_name, image_text in chapter_specific_text.items()
+        )
         
         prompt = f"""Analyze the following figure context and chapter text, identify sentences in chapter text that should reference figures in the figure context.
         Focus on sentences in the thesis text that:
@@ -393,10 +486,22 @@ class FigureGenerator:
         - Exclude sentences that are just lists of items or other non-visual content or the visual elements are not the main focus of the sentence.
 
         """
+        return prompt + "\n\nChapter text to analyze:\n" + text
+    
+    def _parse_figure_response(self, response: Optional[str]) -> Optional[Dict]:
+        """Parse the model's figure-analysis response into a dictionary.
         
-        try:
-            response = self.ai_api.generate_content(prompt + "\n\nChapter text to analyze:\n" + text)
+        Args:
+            response: Raw model response text
             
+        Returns:
+            Dictionary containing figure analysis, or None if the response is
+            missing or unusable
+        """
+        if not response:
+            logger.error("Empty response from figure analysis")
+            return None
+        try:
             # Clean the response - remove any non-JSON content
             json_str = response.strip()
             
@@ -404,132 +509,35 @@ class FigureGenerator:
             start_idx = json_str.find('{')
             end_idx = json_str.rfind('}')
             
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = json_str[start_idx:end_idx+1]
-                
-                # Log the extracted JSON for debugging
+            if start_idx < 0 or end_idx <= start_idx:
+                logger.error("No JSON object found in API response")
+                return None
+            
+            json_str = json_str[start_idx:end_idx+1]
+            
+            # Log the extracted JSON for debugging
+            if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(f"Extracted JSON: {json_str[:100]}...")
+            
+            try:
+                figure_data = _json_loads(json_str)
+            except json.JSONDecodeError as e:
+                # One repair pass for the malformations models actually produce
+                # (trailing commas, missing commas between array objects)
+                logger.warning(f"JSON parsing error, retrying after repair: {e}")
+                repaired = _TRAILING_COMMA_RE.sub(r'\1', _MISSING_OBJECT_COMMA_RE.sub('},{', json_str))
+                figure_data = _json_loads(repaired)
+            
+            # Validate the structure
+            if not isinstance(figure_data, dict) or "figure_references" not in figure_data:
+                logger.error("JSON response missing 'figure_references' key")
+                return None
                 
-                try:
-                    figure_data = json.loads(json_str)
-                    
-                    # Validate the structure
-                    if not isinstance(figure_data, dict) or "figure_references" not in figure_data:
-                        logger.warning("JSON response missing 'figure_references' key")
-                        return {"figure_references": []}
-                        
-                    return figure_data
-                    
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON parsing error: {e}")
-                    logger.debug(f"Problematic JSON: {json_str}")
-                    
-                    # Get error details
-                    error_msg = str(e)
-                    error_line = None
-                    error_col = None
-                    error_pos = None
-                    
-                    # Extract line, column, and position from error message
-                    line_match = re.search(r'line (\d+)', error_msg)
-                    col_match = re.search(r'column (\d+)', error_msg)
-                    char_match = re.search(r'char (\d+)', error_msg)
-                    
-                    if line_match:
-                        error_line = int(line_match.group(1))
-                    if col_match:
-                        error_col = int(col_match.group(1))
-                    if char_match:
-                        error_pos = int(char_match.group(1))
-                        
-                    # Log more detailed error information
-                    if error_pos is not None and error_pos < len(json_str):
-                        # Get context around the error
-                        start = max(0, error_pos - 20)
-                        end = min(len(json_str), error_pos + 20)
-                        context = json_str[start:end]
-                        pointer = ' ' * (min(20, error_pos - start)) + '^'
-                        logger.debug(f"Error context: {context}")
-                        logger.debug(f"Error position: {pointer}")
-                    
-                    # Try a more aggressive approach to fix common JSON issues
-                    try:
-                        # Replace common issues in JSON
-                        fixed_json = json_str.replace("'", '"')  # Replace single quotes with double quotes
-                        fixed_json = re.sub(r',\s*}', '}', fixed_json)  # Remove trailing commas
-                        fixed_json = re.sub(r',\s*]', ']', fixed_json)  # Remove trailing commas in arrays
-                        
-                        # Additional fixes for common JSON issues
-                        # Fix missing commas between objects in arrays
-                        fixed_json = re.sub(r'}\s*{', '},{', fixed_json)
-                        # Fix missing commas between key-value pairs
-                        fixed_json = re.sub(r'"\s*"', '","', fixed_json)
-                        # Fix missing colons between keys and values
-                        fixed_json = re.sub(r'"\s+([{\[])', '": \1', fixed_json)
-                        
-                        # Fix for specific issue with missing comma delimiters between properties
-                        # This pattern looks for property patterns without commas between them
-                        fixed_json = re.sub(r'(["\'])\s*}\s*["\']', r'\1},{"', fixed_json)  # Fix missing comma between objects
-                        fixed_json = re.sub(r'(["\'])\s*(["\'])(?!\s*[,:}])', r'\1,\2', fixed_json)  # Add comma between properties
-                        
-                        # Targeted fix for the specific error position if available
-                        if error_line == 29 and error_col == 143:
-                            # This is the specific error mentioned in the error message
-                            # Try to fix it by inserting a comma at the position
-                            if error_pos is not None and error_pos < len(fixed_json):
-                                fixed_json = fixed_json[:error_pos] + ',' + fixed_json[error_pos:]
-                                logger.debug("Applied targeted fix for line 29, column 143 error")
-                        
-                        # Log the fixed JSON for debugging
-                        logger.debug(f"Attempting to parse fixed JSON: {fixed_json[:100]}...")
-                        
-                        figure_data = json.loads(fixed_json)
-                        logger.info("Successfully parsed JSON after fixing common issues")
-                        
-                        if not isinstance(figure_data, dict) or "figure_references" not in figure_data:
-                            logger.warning("Fixed JSON response missing 'figure_references' key")
-                            return {"figure_references": []}
-                            
-                        return figure_data
-                    except:
-                        # If all attempts fail, return empty result
-                        logger.error("All JSON parsing attempts failed")
-                        
-                        # Last resort: try to extract just the figure_references array
-                        try:
-                            # Look for the figure_references array pattern
-                            refs_pattern = r'"figure_references"\s*:\s*\[(.*?)\]'
-                            refs_match = re.search(refs_pattern, json_str, re.DOTALL)
-                            
-                            if refs_match:
-                                # Construct a valid JSON with just the array
-                                array_content = refs_match.group(1).strip()
-                                # Ensure the array is properly formatted
-                                if array_content:
-                                    # Fix common array formatting issues
-                                    array_content = re.sub(r'}\s*{', '},{', array_content)
-                                    array_content = re.sub(r'"\s*"', '","', array_content)
-                                    
-                                    # Try to parse the array
-                                    try:
-                                        # Wrap in square brackets to make a valid JSON array
-                                        refs_array = json.loads('[' + array_content + ']')
-                                        logger.info("Successfully extracted figure_references array as fallback")
-                                        return {"figure_references": refs_array}
-                                    except:
-                                        pass
-                        except:
-                            pass
-                            
-                        # If all extraction attempts fail, return empty result
-                        return {"figure_references": []}
-            else:
-                logger.error("No JSON object found in API response")
-                return {"figure_references": []}
+            return figure_data
                 
         except Exception as e:
-            logger.error(f"Error in figure analysis: {e}")
-            return {"figure_references": []}
+            logger.error(f"Error parsing figure analysis: {e}")
+            return None
     
     def _update_chapter_figures(self, chapter_path: str, figure_data: Dict, debug_folder: str) -> None:
         """Update chapter markdown with figure references.
@@ -550,26 +558,43 @@ class FigureGenerator:
             # Track which figures have been inserted
             inserted_figures = set()
             
-            # First pass: Add references to sentences and identify paragraphs
-            paragraphs = re.split(r'\n\s*\n', text)
-            updated_paragraphs = []
+            # Locate paragraph boundaries once, then map every reference sentence to
+            # the paragraph holding its first occurrence with a single search over
+            # the whole text instead of testing each paragraph for each sentence.
+            starts = [0]
+            ends = []
+            for m in _PARA_SPLIT_RE.finditer(text):
+                ends.append(m.start())
+                starts.append(m.end())
+            ends.append(len(text))
+            
+            # Group references by the paragraph holding their sentence's first occurrence
+            refs_by_para: Dict[int, List[Dict]] = defaultdict(list)
+            for entry in figure_data.get("figure_references", []):
+                sentence = entry["sentence"].strip()
+                pos = text.find(sentence) if sentence else -1
+                if pos < 0:
+                    continue
+                i = bisect.bisect_right(starts, pos) - 1
+                # Sentences spanning a paragraph break belong to no paragraph
+                if pos + len(sentence) <= ends[i]:
+                    refs_by_para[i].append(entry)
+            
+            # First pass: Add references to sentences and identify paragraphs.
+            # Paragraphs are visited in document order so each figure is placed
+            # after the first paragraph citing it.
+            updated_paragraphs = {}  # Only paragraphs that receive edits are materialized
             paragraph_figures = {}  # Maps paragraph index to list of figures to insert after it
             
-            for i, paragraph in enumerate(paragraphs):
-                updated_paragraph = paragraph
-                paragraph_figure_list = []
-                
-                for entry in figure_data.get("figure_references", []):
+            for i in sorted(refs_by_para):
+                updated_paragraph = text[starts[i]:ends[i]]
+                for entry in refs_by_para[i]:
                     sentence = entry["sentence"].strip()
                     figure_filename = entry["figure_filename"]
                     figure_legend = entry["figure_legend"]
                     
-                    # Skip if sentence not in this paragraph
-                    if sentence not in paragraph:
-                        continue
-                    
                     # Generate a unique figure ID based on the filename and chapter
-                    base_id = re.sub(r'[^a-z0-9]', '-', figure_filename.lower())
+                    base_id = _ID_UNSAFE_RE.sub('-', figure_filename.lower())
                     
                     # Create a unique key that combines chapter and filename
                     chapter_file_key = f"{chapter_name}:{figure_filename}"
@@ -583,85 +608,59 @@ class FigureGenerator:
                         # Include chapter prefix in the ID to ensure uniqueness across chapters
                         chapter_prefix = chapter_name[:3].lower()  # Use first 3 chars of chapter name
                         candidate_id = f"{chapter_prefix}-{base_id}"
-                        
-                        if candidate_id in self.global_figure_ids.values():
+                    
+                        if candidate_id in self._used_ids:
                             # Find the next available suffix
                             suffix = 1
-                            while f"{candidate_id}-{suffix}" in self.global_figure_ids.values():
+                            while f"{candidate_id}-{suffix}" in self._used_ids:
                                 suffix += 1
                             figure_id = f"{candidate_id}-{suffix}"
                         else:
                             figure_id = candidate_id
-                        
+                    
                         # Store the ID for this chapter-filename combination
                         self.global_figure_ids[chapter_file_key] = figure_id
+                        self._used_ids.add(figure_id)
                     
                     # Create the reference text - let pandoc-crossref handle the prefix
                     reference_text = f" (@fig:{figure_id})"
                     
                     # Check if the sentence already has a figure reference
-                    if not re.search(r'@fig:', sentence):
-                        # Replace the sentence with the referenced version
-                        # First, we need to handle LaTeX math expressions
-                        # Find all math expressions in the sentence
-                        math_expressions = re.findall(r'\$[^$]*\$', sentence)
-                        
-                        # Create a temporary version of the sentence with placeholders for math expressions
-                        temp_sentence = sentence
-                        for idx, expr in enumerate(math_expressions):
-                            temp_sentence = temp_sentence.replace(expr, f"MATH_PLACEHOLDER_{idx}")
-                        
-                        # Escape special regex characters in the modified sentence
-                        escaped_temp_sentence = re.escape(temp_sentence)
-                        
-                        # Replace the placeholders with the original math expressions
-                        for idx, expr in enumerate(math_expressions):
-                            escaped_temp_sentence = escaped_temp_sentence.replace(f"MATH_PLACEHOLDER_{idx}", expr)
-                        
-                        # Add the reference at the end of the sentence, before any punctuation
-                        if sentence.rstrip()[-1] in ['.', '?', '!']:
+                    if '@fig:' not in sentence:
+                        # Replace the sentence with the referenced version (a literal
+                        # replacement, so math and regex metacharacters need no escaping)
+                        stripped = sentence.rstrip()
+                        if stripped[-1] in ['.', '?', '!']:
                             # If sentence ends with punctuation, insert reference before the punctuation
-                            updated_paragraph = re.sub(
-                                f"{escaped_temp_sentence}",
-                                f"{sentence.rstrip()[:-1]}{reference_text}{sentence.rstrip()[-1]}",
-                                updated_paragraph,
-                                count=1
-                            )
+                            new_sentence = f"{stripped[:-1]}{reference_text}{stripped[-1]}"
                         else:
                             # If no punctuation, just append the reference
-                            updated_paragraph = re.sub(
-                                f"{escaped_temp_sentence}",
-                                f"{sentence}{reference_text}",
-                                updated_paragraph,
-                                count=1
-                            )
+                            new_sentence = f"{sentence}{reference_text}"
+                        updated_paragraph = updated_paragraph.replace(sentence, new_sentence, 1)
                     
                     # Add figure to this paragraph's figure list if not already inserted elsewhere
                     if figure_filename not in inserted_figures:
                         figure_markdown = f"\n\n![{figure_legend}]({figure_filename}){{#fig:{figure_id}}}\n"
-                        paragraph_figure_list.append(figure_markdown)
+                        paragraph_figures.setdefault(i, []).append(figure_markdown)
                         inserted_figures.add(figure_filename)
                 
                 # Store the updated paragraph
-                updated_paragraphs.append(updated_paragraph)
-                
-                # Store any figures to be inserted after this paragraph
-                if paragraph_figure_list:
-                    paragraph_figures[i] = paragraph_figure_list
+                updated_paragraphs[i] = updated_paragraph
             
             # Second pass: Reconstruct the document with figures inserted after appropriate paragraphs
-            final_text = ""
-            for i, paragraph in enumerate(updated_paragraphs):
-                final_text += paragraph
+            parts: List[str] = []
+            last = len(starts) - 1
+            for i, (start, end) in enumerate(zip(starts, ends)):
+                parts.append(updated_paragraphs[i] if i in updated_paragraphs else text[start:end])
                 
                 # Add figures after this paragraph if needed
                 if i in paragraph_figures:
-                    for figure in paragraph_figures[i]:
-                        final_text += figure
+                    parts.extend(paragraph_figures[i])
                 
                 # Add paragraph separator (except for the last paragraph)
-                if i < len(updated_paragraphs) - 1:
-                    final_text += "\n\n"
+                if i < last:
+                    parts.append("\n\n")
+            final_text = "".join(parts)
             
             # Save the updated chapter
             output_path = os.path.join(debug_folder, f"{os.path.basename(chapter_path).replace('_cited.md', '_with_figures.md')}")
@@ -3,12 +3,8 @@ import logging
 import re
 from typing import Dict, Optional
 from ..ai.ai_api_interface import AIAPIInterface
+from ..ai._cache import generate_or_none
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 class PageClassifier:
@@ -190,7 +186,7 @@ class PageClassifier:
             
         # Get classification from API
         classification_prompt = self._create_classification_prompt(extracted_data)
-        classification_result = self.ai_api.generate_content(classification_prompt)
+        classification_result = generate_or_none(self.ai_api, classification_prompt)
         if not classification_result:
             logger.error("No classification result received from API")
             return {}
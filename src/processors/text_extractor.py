@@ -5,12 +5,8 @@ from PIL import Image
 import io
 from typing import List, Dict, Optional
 from ..ai.ai_api_interface import AIAPIInterface
+from ..ai._cache import cached_generate
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 class TextExtractor:
@@ -87,7 +83,7 @@ class TextExtractor:
         if previous_paragraph:
             prompt += f"""\n\n**Previous slide context:** \n\n{previous_paragraph}\n\nConsidering this context from the previous slide image to write the description provided in the current slide. Ensure the description for this slide logically follows the previous context. However, if the slide is unrelated to previous context (e.g., a new topic or a different section), ignore the previous context and generate a description based solely on the current slide."""
 
-        return self.ai_api.generate_content(prompt, image)
+        return cached_generate(self.ai_api, prompt, image)
 
     def extract_text(self, output_file: str) -> Dict[str, str]:
         """Extract text from all pages and write to output file.
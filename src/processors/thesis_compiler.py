@@ -5,11 +5,6 @@ import shutil
 from typing import List
 from ..utils.style_manager import StyleManager
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 class ThesisCompiler:
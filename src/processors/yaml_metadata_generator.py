@@ -4,13 +4,9 @@ import time
 import concurrent.futures
 from typing import Dict, Optional, List
 from ..ai.ai_api_interface import AIAPIInterface
+from ..ai._cache import generate_or_none
 from ..utils.style_manager import StyleManager
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 class YamlMetadataGenerator:
@@ -46,7 +42,7 @@ class YamlMetadataGenerator:
         Text:
         """ + intro_content
 
-        metadata = self.ai_api.generate_content(metadata_prompt)
+        metadata = generate_or_none(self.ai_api, metadata_prompt)
         result = {
             'title': "Thesis Title",
             'author': "Author Name",
@@ -77,7 +73,7 @@ class YamlMetadataGenerator:
         
         Thesis content:\n""" + "\n\n".join(chapters_content.values())
 
-        abstract = self.ai_api.generate_content(abstract_prompt)
+        abstract = generate_or_none(self.ai_api, abstract_prompt)
         return abstract if abstract else "Abstract generation failed."
         
     def generate_chinese_abstract(self, english_abstract: str) -> str:
@@ -103,7 +99,7 @@ class YamlMetadataGenerator:
         English Abstract:
         {english_abstract}"""
 
-        chinese_abstract = self.ai_api.generate_content(chinese_prompt)
+        chinese_abstract = generate_or_none(self.ai_api, chinese_prompt)
         return chinese_abstract if chinese_abstract else "中文摘要生成失敗。"
         
     def generate_acknowledgements(self, advisor_name: str = None) -> str:
@@ -136,7 +132,7 @@ class YamlMetadataGenerator:
         Please write ONLY the acknowledgements content in Traditional Chinese, without any title or additional commentary.
         The text should be suitable for direct inclusion in a thesis document."""
 
-        acknowledgements = self.ai_api.generate_content(acknowledgements_prompt)
+        acknowledgements = generate_or_none(self.ai_api, acknowledgements_prompt)
         return acknowledgements if acknowledgements else "感謝指導教授的悉心指導，以及家人朋友的支持與鼓勵。"
         
     def generate_metadata(self, chapters_dir: str, output_file: str) -> bool:
@@ -1,7 +1,32 @@
 """Utility modules for Slide2Thesis."""
 
-from .style_manager import StyleManager
+import importlib
+
+# Submodules are imported on first attribute access (PEP 562) so that importing
+# the package does not pull in every provider SDK and processing dependency.
+_lazy = {
+    'StyleManager': '.style_manager',
+    'JobStore': '.job_store',
+    'PubMedCache': '.pubmed_cache',
+    'configure_logging': '.log_setup',
+    'PipelineState': '.pipeline_state',
+}
 
 __all__ = [
     'StyleManager',
-] 
\ No newline at end of file
+    'JobStore',
+    'PubMedCache',
+    'configure_logging',
+    'PipelineState',
+]
+
+def __getattr__(name):
+    if name in _lazy:
+        module = importlib.import_module(_lazy[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
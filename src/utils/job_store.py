@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+class JobStore:
+    """SQLite-backed job status store shared by all web worker processes.
+    
+    The database runs in WAL mode so readers in one process do not block a
+    background job writing its progress from another.
+    """
+    
+    _FIELDS = ('status', 'message', 'filename', 'file_path', 'result_path')
+    
+    def __init__(self, db_path: str = 'jobs.db'):
+        """Initialize the JobStore.
+        
+        Args:
+            db_path: Path to the SQLite database file (default: 'jobs.db').
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT, message TEXT, "
+                "filename TEXT, file_path TEXT, result_path TEXT)"
+            )
+    
+    def create(self, job_id: str, filename: str, file_path: str,
+               status: str = 'processing', message: str = 'Job started') -> None:
+        """Create a new job record.
+        
+        Args:
+            job_id: Unique job identifier.
+            filename: Name of the uploaded file.
+            file_path: Path where the uploaded file was saved.
+            status: Initial job status (default: 'processing').
+            message: Initial status message (default: 'Job started').
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, message, filename, file_path, result_path) "
+                "VALUES (?, ?, ?, ?, ?, NULL)",
+                (job_id, status, message, filename, file_path)
+            )
+    
+    def update(self, job_id: str, **fields) -> None:
+        """Atomically update one or more fields of a job.
+        
+        Args:
+            job_id: Unique job identifier.
+            **fields: Column values to set (status, message, filename, file_path, result_path).
+            
+        Raises:
+            ValueError: If an unknown field is given.
+        """
+        unknown = set(fields) - set(self._FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return
+        
+        assignments = ", ".join(f"{name}=?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id=?",
+                (*fields.values(), job_id)
+            )
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Optional[str]]]:
+        """Get a job record.
+        
+        Args:
+            job_id: Unique job identifier.
+            
+        Returns:
+            Dictionary of job fields, or None if the job does not exist.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, message, filename, file_path, result_path FROM jobs WHERE id=?",
+                (job_id,)
+            ).fetchone()
+        return dict(row) if row else None
@@ -0,0 +1,42 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+_listener = None
+
+def configure_logging(level: int = logging.INFO,
+                      fmt: str = '%(asctime)s - %(levelname)s - %(message)s') -> None:
+    """Configure root logging so records are written to stderr on a background thread.
+
+    The root logger gets a QueueHandler, so a logging call only enqueues the record;
+    a QueueListener formats and writes it. Existing root handlers are replaced, and
+    calling this again restarts the listener with the new settings.
+
+    Args:
+        level: Root logger level.
+        fmt: Format string for the stderr handler.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(fmt))
+    log_queue = queue.SimpleQueue()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+
+@atexit.register
+def _stop_listener() -> None:
+    # Flush queued records before the interpreter exits
+    if _listener is not None:
+        _listener.stop()
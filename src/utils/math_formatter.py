@@ -4,6 +4,16 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Already-formatted math: \[...\], $...$ and \(...\)
+_DISPLAY_MATH_RE = re.compile(r'\\\[.*?\\\]', re.DOTALL)
+_INLINE_MATH_RE = re.compile(r'\$[^$]+\$')
+_PAREN_MATH_RE = re.compile(r'\\\(.*?\\\)', re.DOTALL)
+# Single letters followed by whitespace or punctuation, candidates for variables
+_VARIABLE_RE = re.compile(r'\b([a-zA-Z])\b(?=\s|[,.])')
+# Doubled delimiters left behind by overlapping replacements
+_DOUBLE_DOLLAR_RE = re.compile(r'\$\$([^$]+)\$\$')
+_NESTED_DOLLAR_RE = re.compile(r'\$\$([^$]*)\$([^$]*)\$\$')
+
 class MathFormatter:
     """Formats mathematical content in text by detecting patterns and adding LaTeX delimiters."""
     
@@ -42,22 +52,25 @@ class MathFormatter:
             'ω': r'\omega',
         }
         
-        # Patterns for different math constructs
+        # Patterns for different math constructs, compiled once per formatter
         self.patterns = {
             # Simple equations: a = b + c, x = 5, etc.
-            'equations': r'\b([a-zA-Z]+\s*[=<>≤≥≠]\s*[a-zA-Z0-9\s+\-*/^()]+)',
+            'equations': re.compile(r'\b([a-zA-Z]+\s*[=<>≤≥≠]\s*[a-zA-Z0-9\s+\-*/^()]+)'),
             
             # Fractions: 1/2, a/b, (x+1)/(y-2)
-            'fractions': r'(\([^)]+\)/\([^)]+\)|[a-zA-Z0-9]+/[a-zA-Z0-9]+)',
+            # The lookbehinds in this and the script patterns start a match only at
+            # the beginning of a run: a start inside the run would fail the same way,
+            # but rescanning from each position makes long runs quadratic.
+            'fractions': re.compile(r'(\([^)]+\)/\([^)]+\)|(?<![a-zA-Z0-9])[a-zA-Z0-9]+/[a-zA-Z0-9]+)'),
             
             # Subscripts: H_2O, x_1, a_i
-            'subscripts': r'([a-zA-Z]+)_([a-zA-Z0-9]+)',
+            'subscripts': re.compile(r'(?<![a-zA-Z])([a-zA-Z]+)_([a-zA-Z0-9]+)'),
             
             # Superscripts: x^2, e^(x+1), 10^3
-            'superscripts': r'([a-zA-Z0-9]+)\^(\([^)]+\)|[a-zA-Z0-9]+)',
+            'superscripts': re.compile(r'(?<![a-zA-Z0-9])([a-zA-Z0-9]+)\^(\([^)]+\)|[a-zA-Z0-9]+)'),
             
             # Variables: single letters in scientific context
-            'variables': r'\b([a-zA-Z])\b(?!\w)',
+            'variables': re.compile(r'\b([a-zA-Z])\b(?!\w)'),
         }
     
     def format_content(self, content: str) -> str:
@@ -112,9 +125,9 @@ class MathFormatter:
             counter += 1
             return placeholder
         
-        content = re.sub(r'\\\[.*?\\\]', replace_display_math, content, flags=re.DOTALL)
-        content = re.sub(r'\$[^$]+\$', replace_inline_math, content)
-        content = re.sub(r'\\\(.*?\\\)', replace_paren_math, content, flags=re.DOTALL)
+        content = _DISPLAY_MATH_RE.sub(replace_display_math, content)
+        content = _INLINE_MATH_RE.sub(replace_inline_math, content)
+        content = _PAREN_MATH_RE.sub(replace_paren_math, content)
         
         return content, math_blocks
     
@@ -150,12 +163,12 @@ class MathFormatter:
             line = self._wrap_symbols_in_math(line)
         
         # Check for equations (highest priority)
-        equation_matches = list(re.finditer(self.patterns['equations'], line))
+        equation_matches = list(self.patterns['equations'].finditer(line))
         for match in reversed(equation_matches):  # Process from right to left to maintain positions
             line = self._format_equation(line, match)
         
         # Check for fractions
-        fraction_matches = list(re.finditer(self.patterns['fractions'], line))
+        fraction_matches = list(self.patterns['fractions'].finditer(line))
         for match in reversed(fraction_matches):
             line = self._format_fraction(line, match)
         
@@ -219,7 +232,7 @@ class MathFormatter:
                 return match.group(0)  # Already in math mode
             return f"${match.group(1)}_{{{match.group(2)}}}$"
         
-        line = re.sub(self.patterns['subscripts'], replace_subscript, line)
+        line = self.patterns['subscripts'].sub(replace_subscript, line)
         
         # Superscripts
         def replace_superscript(match):
@@ -231,7 +244,7 @@ class MathFormatter:
                 return match.group(0)
             return f"${base}^{{{exp}}}$"
         
-        line = re.sub(self.patterns['superscripts'], replace_superscript, line)
+        line = self.patterns['superscripts'].sub(replace_superscript, line)
         
         return line
     
@@ -258,7 +271,7 @@ class MathFormatter:
                     return var
                 return f"${var}$"
             
-            line = re.sub(r'\b([a-zA-Z])\b(?=\s|[,.])', replace_variable, line)
+            line = _VARIABLE_RE.sub(replace_variable, line)
         
         return line
     
@@ -303,10 +316,10 @@ class MathFormatter:
     def _clean_double_math(self, line: str) -> str:
         """Clean up double math formatting like $$x$$ -> $x$."""
         # Remove double dollar signs
-        line = re.sub(r'\$\$([^$]+)\$\$', r'$\1$', line)
+        line = _DOUBLE_DOLLAR_RE.sub(r'$\1$', line)
         
         # Remove nested math formatting
-        line = re.sub(r'\$\$([^$]*)\$([^$]*)\$\$', r'$\1\2$', line)
+        line = _NESTED_DOLLAR_RE.sub(r'$\1\2$', line)
         
         return line
     
@@ -0,0 +1,105 @@
+import os
+import glob
+import json
+import hashlib
+import logging
+from typing import Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+_STATE_FILE = 'pipeline_state.json'
+_HASH_CHUNK = 1 << 20
+
+class PipelineState:
+    """Record input/output fingerprints of pipeline steps in a debug folder.
+
+    A step is current when its input files and parameters hash the same as on
+    its last successful run and its output files are still present and
+    unmodified, so rerunning the pipeline can skip it.
+    """
+
+    def __init__(self, debug_folder: str):
+        """Initialize the PipelineState.
+
+        Args:
+            debug_folder: Folder holding the step files and pipeline_state.json.
+        """
+        self.debug_folder = debug_folder
+        self._path = os.path.join(debug_folder, _STATE_FILE)
+        self._state: Dict[str, Dict[str, str]] = {}
+        self._pending: Dict[str, str] = {}
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                self._state = json.load(f)
+        except (OSError, ValueError):
+            self._state = {}
+
+    def _resolve(self, patterns: Sequence[str]) -> List[str]:
+        """Expand patterns into sorted file paths.
+
+        Relative patterns are globbed inside the debug folder; absolute paths are
+        taken literally, so metacharacters such as '[' in them are not expanded.
+        """
+        paths = set()
+        for pattern in patterns:
+            if os.path.isabs(pattern):
+                paths.add(pattern)
+            else:
+                paths.update(glob.glob(os.path.join(glob.escape(self.debug_folder), pattern)))
+        return sorted(p for p in paths if os.path.isfile(p))
+
+    def _fingerprint(self, patterns: Sequence[str], params: Sequence[str] = ()) -> str:
+        """Hash the names and contents of the matching files together with params."""
+        digest = hashlib.blake2b(digest_size=32)
+        for param in params:
+            digest.update(str(param).encode('utf-8') + b'\0')
+        for path in self._resolve(patterns):
+            digest.update(os.path.basename(path).encode('utf-8') + b'\0')
+            with open(path, 'rb') as f:
+                while chunk := f.read(_HASH_CHUNK):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def is_current(self, step: str, inputs: Sequence[str], outputs: Sequence[str],
+                   params: Sequence[str] = ()) -> bool:
+        """Check whether a step can be skipped.
+
+        Args:
+            step: Step name.
+            inputs: Glob patterns relative to the debug folder, or absolute file paths.
+            outputs: Glob patterns of the files the step produces.
+            params: Extra values the step output depends on (model, style, ...).
+
+        Returns:
+            True if inputs, params and outputs are unchanged since the last recorded run.
+        """
+        input_hash = self._fingerprint(inputs, params)
+        self._pending[step] = input_hash
+        previous = self._state.get(step)
+        if not previous or previous.get('input_hash') != input_hash:
+            return False
+        if not self._resolve(outputs):
+            return False
+        return previous.get('output_hash') == self._fingerprint(outputs)
+
+    def record(self, step: str, outputs: Sequence[str]) -> None:
+        """Store the fingerprints of a step that just completed successfully.
+
+        Args:
+            step: Step name previously passed to is_current.
+            outputs: Glob patterns of the files the step produced.
+        """
+        input_hash = self._pending.pop(step, None)
+        if input_hash is None:
+            return
+        self._state[step] = {
+            'input_hash': input_hash,
+            'output_hash': self._fingerprint(outputs),
+        }
+        tmp_path = f"{self._path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, indent=2)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.warning(f"Could not save pipeline state: {e}")
@@ -0,0 +1,68 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+class PubMedCache:
+    """SQLite-backed cache for PubMed E-utilities results.
+    
+    Values are stored as JSON and expire after a fixed time-to-live. PubMed
+    records are append-only, so entries are never invalidated explicitly.
+    """
+    
+    def __init__(self, db_path: str, ttl: float = 30 * 24 * 3600, refresh: bool = False):
+        """Initialize the PubMedCache.
+        
+        Args:
+            db_path: Path to the SQLite database file.
+            ttl: Seconds before a cached entry expires (default: 30 days).
+            refresh: Ignore existing entries on read while still storing new ones.
+        """
+        self.ttl = ttl
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT, created REAL)"
+            )
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value.
+        
+        Args:
+            key: Cache key, e.g. 'esearch:<query>:<retmax>' or 'efetch:<pmid>'.
+            
+        Returns:
+            The cached value, or None if missing, expired or refreshing.
+        """
+        if self.refresh:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key=? AND created>?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def set(self, key: str, value: Any) -> None:
+        """Store a value in the cache.
+        
+        Args:
+            key: Cache key.
+            value: JSON-serializable value.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+    
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()